@@ -7,15 +7,18 @@ import copy
 import json
 import logging
 import logging.config
+import multiprocessing
 import os
 import shutil
 import signal
+import threading
 from abc import abstractmethod
 from argparse import ArgumentParser
-from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from multiprocessing.connection import wait as wait_connections
 from pathlib import Path
-from time import sleep
+from time import sleep, time_ns
 from uuid import uuid4
 from zipfile import ZIP_DEFLATED, ZipFile
 
@@ -35,8 +38,14 @@ DEFAULT_CONFIG = {
     "QUEUE": None,
     "CAPS": None,
     "BACKOFF_TIME": 5.0,
+    "ASSIGN_WAIT": 0,
     "NET_TIMEOUT": 300,
     "ONESHOT": False,
+    "PREFETCH": False,
+    "WORKERS": 1,
+    "MODULE_CONCURRENCY": {},
+    "SPOOL_DIR": "spool",
+    "SPOOL_MAX_SIZE": 1024**3,
 }
 
 
@@ -73,7 +82,7 @@ def config_from_args(args):
     """pull config variables from parsed args/generic object"""
 
     config = {}
-    for item in ["server", "apikey", "queue", "caps", "oneshot"]:
+    for item in ["server", "apikey", "queue", "caps", "oneshot", "workers"]:
         if getattr(args, item) is not None:
             config[item.upper()] = getattr(args, item)
     return config
@@ -91,6 +100,48 @@ def zipdir(path, zipto):
                     output_zip.write(filepath, arcname)
 
 
+class OutputSpool:
+    """durable on-disk spool of finished assignment outputs waiting for upload"""
+
+    def __init__(self, path, max_size):
+        self.path = Path(path)
+        self.path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.event = threading.Event()
+
+        # outputs partially moved to spool before previous agent run was interrupted
+        for item in self.path.glob("*.zip.tmp"):
+            item.unlink()
+
+    def put(self, assignment_id, retval, output_file):
+        """
+        move assignment output file to spool. spool might reside on other filesystem, output is moved
+        under temporary name first so that the uploader never picks up partially copied file.
+        """
+
+        name = f"{time_ns()}_{assignment_id}_{retval}.zip"
+        shutil.move(output_file, self.path / f"{name}.tmp")
+        os.replace(self.path / f"{name}.tmp", self.path / name)
+        self.event.set()
+
+    def items(self):
+        """spooled outputs oldest-first, yields (path, assignment_id, retval)"""
+
+        for item in sorted(self.path.glob("*.zip"), key=lambda x: int(x.name.split("_", maxsplit=1)[0])):
+            _, assignment_id, retval = item.stem.split("_")
+            yield item, assignment_id, int(retval)
+
+    def size(self):
+        """total size of spooled outputs"""
+
+        return sum(item.stat().st_size for item in self.path.glob("*.zip"))
+
+    def full(self):
+        """spool size limit reached"""
+
+        return bool(self.max_size) and (self.size() >= self.max_size)
+
+
 class AgentBase(TerminateContextRunner):
     """base agent impl containing main (sub)process handling code"""
 
@@ -142,6 +193,11 @@ class AgentBase(TerminateContextRunner):
 class ServerableAgent(AgentBase):  # pylint: disable=too-many-instance-attributes
     """agent to fetch and execute assignments from central job server"""
 
+    # network timeout for uploads performed on terminate
+    TERMINATE_NET_TIMEOUT = 10
+    # long-polling request network timeout on top of the requested wait
+    ASSIGN_WAIT_GRACE = 10
+
     def __init__(self, config):
         super().__init__()
 
@@ -150,18 +206,48 @@ class ServerableAgent(AgentBase):  # pylint: disable=too-many-instance-attribute
         self.queue = config["QUEUE"]
         self.caps = config["CAPS"]
         self.backoff_time = config["BACKOFF_TIME"]
+        self.assign_wait = config["ASSIGN_WAIT"]
         self.net_timeout = config["NET_TIMEOUT"]
         self.oneshot = config["ONESHOT"]
+        self.prefetch = config["PREFETCH"]
+        self.workers = config["WORKERS"]
+        self.module_concurrency = config["MODULE_CONCURRENCY"]
+        if self.workers < 1:
+            raise ValueError("WORKERS must be at least 1")
+        if invalid := [module for module, cap in self.module_concurrency.items() if cap < 1]:
+            raise ValueError(f"MODULE_CONCURRENCY must be at least 1, invalid for {invalid}")
 
         self.loop = True
+        self.terminated = False
+        self.pool = {}
+        self.spool = OutputSpool(config["SPOOL_DIR"], config["SPOOL_MAX_SIZE"])
+        self.upload_retry = set()
+        self.thread_local = threading.local()
         self.get_assignment_url = f"{self.server}/api/v2/scheduler/job/assign"
-        self.upload_output_url = f"{self.server}/api/v2/scheduler/job/output"
+        self.upload_output_url = f"{self.server}/api/v3/scheduler/job/{{id}}/output"
 
         self.get_assignment_params = {}
         if self.queue:
             self.get_assignment_params["queue"] = self.queue
         if self.caps:
             self.get_assignment_params["caps"] = self.caps
+        # prefetch must not block, is issued without long-poll
+        self.prefetch_assignment_params = dict(self.get_assignment_params)
+        self.get_assignment_timeout = None
+        if self.assign_wait and not self.oneshot:
+            # long-poll, server holds the request until work is available. request is not interrupted
+            # on terminate, short timeout bounds the time until the agent notices the terminate.
+            self.get_assignment_params["wait"] = self.assign_wait
+            self.get_assignment_timeout = self.assign_wait + self.ASSIGN_WAIT_GRACE
+
+    def terminate(self, _signum=None, _frame=None):  # pragma: no cover  ; running over multiprocessing
+        """terminate at once, pending long-polling request is left to finish within its timeout"""
+
+        super().terminate(_signum, _frame)
+        self.terminated = True
+        for proc, _ in self.pool.values():
+            if proc.is_alive():
+                os.kill(proc.pid, signal.SIGTERM)
 
     def shutdown(self, signum=None, frame=None):  # pragma: no cover  pylint: disable=unused-argument  ; running over multiprocessing
         """wait for current assignment to finish"""
@@ -179,18 +265,27 @@ class ServerableAgent(AgentBase):  # pylint: disable=too-many-instance-attribute
         finally:
             signal.signal(signal.SIGUSR1, self.original_signal_handlers[signal.SIGUSR1])
 
-    def call_api(self, url, data):
+    @property
+    def session(self):
+        """http session, each thread (main, prefetcher, uploader) uses own session as requests.Session is not thread-safe"""
+
+        if not hasattr(self.thread_local, "session"):
+            self.thread_local.session = requests.Session()
+            self.thread_local.session.headers.update({"X-API-KEY": self.apikey, "Accept-Encoding": "gzip"})
+        return self.thread_local.session
+
+    def call_api(self, url, data, timeout=None):
         """call api"""
 
-        return requests.post(url, json=data, headers={"X-API-KEY": self.apikey}, timeout=self.net_timeout)
+        return self.session.post(url, json=data, timeout=timeout or self.net_timeout)
 
     def get_assignment(self):
         """get assignment from server"""
 
         assignment = None
-        while self.loop and not assignment:
+        while self.loop and (not self.terminated) and (not assignment):
             try:
-                response = self.call_api(self.get_assignment_url, self.get_assignment_params)
+                response = self.call_api(self.get_assignment_url, self.get_assignment_params, self.get_assignment_timeout)
                 response.raise_for_status()
                 assignment = response.json()
                 if not assignment:  # response-nowork
@@ -211,43 +306,263 @@ class ServerableAgent(AgentBase):  # pylint: disable=too-many-instance-attribute
         self.log.info("get_assignment success, %s", assignment)
         return assignment, 0
 
-    def upload_output(self, output):
-        """upload assignment output to the server"""
+    def prefetch_assignment(self):
+        """single non-blocking assignment request, returns None on nowork or error"""
 
-        uploaded = False
-        while not uploaded:
-            try:
-                response = self.call_api(self.upload_output_url, output)
-                response.raise_for_status()
-                uploaded = True
-            except requests.exceptions.RequestException as exc:
-                self.log.error("upload_output error, %s", exc)
-                sleep(self.backoff_time)
-        self.log.info("upload_output success, %s", output["id"])
+        try:
+            response = self.call_api(self.get_assignment_url, self.prefetch_assignment_params)
+            response.raise_for_status()
+            if assignment := response.json():
+                JobAssignmentSchema().load(assignment)
+                self.log.info("prefetch_assignment success, %s", assignment)
+                return assignment
+        except (requests.exceptions.RequestException, json.decoder.JSONDecodeError, marshmallow.ValidationError) as exc:
+            self.log.error("prefetch_assignment error, %s", exc)
+        return None
+
+    def get_output_offset(self, url, timeout=None):
+        """get length of already uploaded output, restart from scratch on any error"""
+
+        try:
+            response = self.session.get(url, timeout=timeout or self.net_timeout)
+            response.raise_for_status()
+            return response.json().get("offset", 0)
+        except (requests.exceptions.RequestException, json.decoder.JSONDecodeError) as exc:
+            self.log.error("get_output_offset error, %s", exc)
+        return 0
+
+    def upload_output(self, assignment_id, retval, output_file, timeout=None):
+        """
+        stream assignment output file to the server, previously interrupted upload is resumed from last offset
+
+        :param timeout: network timeout, NET_TIMEOUT by default
+        :return: upload success
+        :rtype: bool
+        """
+
+        url = self.upload_output_url.format(id=assignment_id)
+        offset = self.get_output_offset(url, timeout) if assignment_id in self.upload_retry else 0
+        try:
+            with open(output_file, "rb") as output_fd:
+                output_fd.seek(offset)
+                # zip output is already compressed, sent as is
+                response = self.session.post(
+                    url,
+                    params={"retval": retval, "offset": offset},
+                    data=output_fd,
+                    headers={"Content-Type": "application/octet-stream"},
+                    timeout=timeout or self.net_timeout,
+                )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as exc:
+            self.log.error("upload_output error, %s", exc)
+            self.upload_retry.add(assignment_id)
+            return False
+
+        self.upload_retry.discard(assignment_id)
+        self.log.info("upload_output success, %s", assignment_id)
+        return True
+
+    def drain_spool(self, timeout=None):
+        """
+        upload spooled outputs oldest-first
+
+        :param timeout: network timeout, NET_TIMEOUT by default
+        :return: False on first failed upload
+        :rtype: bool
+        """
+
+        for item, assignment_id, retval in self.spool.items():
+            if not self.upload_output(assignment_id, retval, item, timeout):
+                return False
+            item.unlink()
+        return True
+
+    def spool_uploader(self, stop):
+        """
+        background uploader, drains spool until stopped and makes final pass on exit. on terminate the
+        final pass uses short network timeout so the agent exits promptly, outputs which could not be
+        uploaded in final pass are kept in spool and uploaded by next agent run.
+        """
+
+        while not stop.is_set():
+            self.spool.event.clear()
+            if self.drain_spool():
+                self.spool.event.wait()
+            else:
+                stop.wait(self.backoff_time)
+        self.drain_spool(self.TERMINATE_NET_TIMEOUT if self.terminated else None)
+
+    @contextmanager
+    def spool_uploader_context(self):
+        """run background spool uploader"""
+
+        stop = threading.Event()
+        uploader = threading.Thread(target=self.spool_uploader, args=(stop,))
+        uploader.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            self.spool.event.set()
+            uploader.join()
+
+    def abandon_assignment(self, assignment):
+        """
+        report already fetched assignment as failed job with empty output, so it does not stay running on server.
+        output is spooled for next agent run if the upload fails.
+        """
+
+        self.log.warning("assignment %s abandoned on terminate", assignment["id"])
+        output_file = f"{assignment['id']}.zip"
+        with ZipFile(output_file, "w"):
+            pass
+        if self.upload_output(assignment["id"], 1, output_file, self.TERMINATE_NET_TIMEOUT):
+            os.unlink(output_file)
+        else:
+            self.spool.put(assignment["id"], 1, output_file)
+
+    def wait_spool(self):
+        """backpressure, wait while spool is over size limit"""
+
+        if full := self.spool.full():
+            self.log.warning("output spool full, waiting for upload")
+            sleep(self.backoff_time)
+        return full
 
     def run(self, **kwargs):
-        """fetch, process and upload output for assignment given by server"""
+        """run agent in selected mode"""
+
+        if self.workers > 1:
+            return self.run_pool()
+        return self.run_pipeline()
+
+    def run_pipeline(self):
+        """
+        fetch, process and upload output for assignment given by server
+
+        outputs are spooled on disk and uploaded in background while next assignment is processed,
+        optionaly the next assignment is prefetched while current one is processed. on shutdown
+        the agent processes already prefetched assignment and tries to upload all spooled outputs,
+        on terminate the prefetched assignment is reported as failed.
+        """
 
         retval = 0
-        with self.terminate_context(), self.shutdown_context():
-            while self.loop:
-                assignment, retval = self.get_assignment()
+        prefetched = None
+        with (
+            self.terminate_context(),
+            self.shutdown_context(),
+            self.spool_uploader_context(),
+            ThreadPoolExecutor(max_workers=1) as prefetcher,
+        ):
+            while self.loop or (prefetched and not self.terminated):
+                assignment = prefetched.result() if prefetched else None
+                prefetched = None
+                if not assignment:
+                    if not self.loop:  # pragma: no cover  ; running over multiprocessing
+                        break
+                    if self.wait_spool():
+                        continue
+                    assignment, retval = self.get_assignment()
 
                 if assignment:
+                    if self.prefetch and self.loop and not self.oneshot:
+                        prefetched = prefetcher.submit(self.prefetch_assignment)
                     retval = self.process_assignment(assignment)
-
-                    assignment_output_file = f"{assignment['id']}.zip"
-                    output = {
-                        "id": assignment["id"],
-                        "retval": retval,
-                        "output": b64encode(Path(assignment_output_file).read_bytes()).decode("utf-8"),
-                    }
-                    self.upload_output(output)
-                    os.remove(assignment_output_file)
+                    self.spool.put(assignment["id"], retval, f"{assignment['id']}.zip")
 
                 if self.oneshot:
                     self.loop = False
 
+            if prefetched and (assignment := prefetched.result()):  # pragma: no cover  ; running over multiprocessing
+                self.abandon_assignment(assignment)
+
+        self.log.info("exit")
+        return retval
+
+    def pool_slot_available(self, assignment):
+        """check worker pool and module concurrency limits for assignment"""
+
+        module = assignment["config"]["module"]
+        running = sum(1 for _, item in self.pool.values() if item["config"]["module"] == module)
+        return (len(self.pool) < self.workers) and (running < self.module_concurrency.get(module, self.workers))
+
+    def pool_start(self, assignment):
+        """
+        start worker process for assignment
+
+        agent runs uploader and prefetch threads and shares http session, worker is spawned as fresh
+        interpreter instead of fork so it does not inherit locks held by other threads.
+        """
+
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        proc = multiprocessing.get_context("spawn").Process(target=pool_worker, args=(assignment, child_conn, self.log.getEffectiveLevel()))
+        proc.start()
+        child_conn.close()
+        self.pool[parent_conn] = (proc, assignment)
+
+    def pool_reap(self, conn):
+        """collect finished worker process, returns assignment and retval"""
+
+        proc, assignment = self.pool.pop(conn)
+        try:
+            retval = conn.recv()
+        except EOFError:  # pragma: no cover  ; worker died without reporting retval
+            retval = 1
+            # worker terminated before it could pack the output, pack whatever was left in job directory
+            if not Path(f"{assignment['id']}.zip").exists():
+                os.makedirs(assignment["id"], mode=0o700, exist_ok=True)
+                zipdir(assignment["id"], f"{assignment['id']}.zip")
+                shutil.rmtree(assignment["id"])
+        conn.close()
+        proc.join()
+        return assignment, retval
+
+    def run_pool(self):
+        """
+        fetch, process and upload assignments concurrently in pool of worker processes
+
+        each assignment runs in spawned worker process with own job directory, fetched
+        assignment waits for free slot if module concurrency limit is reached. terminate
+        is forwarded to all workers, on shutdown agent waits for all running workers.
+        """
+
+        retval = 0
+        pending = None
+        with self.terminate_context(), self.shutdown_context(), self.spool_uploader_context():
+            while self.loop or self.pool or (pending and not self.terminated):
+                if self.loop and (not pending) and (not self.pool) and self.wait_spool():
+                    continue
+                if self.loop and (not pending) and (len(self.pool) < self.workers) and (not self.spool.full()):
+                    if self.pool:
+                        pending = self.prefetch_assignment()
+                    else:
+                        pending, retval = self.get_assignment()
+                    if self.oneshot:
+                        self.loop = False
+
+                if pending and self.pool_slot_available(pending):
+                    self.pool_start(pending)
+                    pending = None
+                    continue
+
+                if not self.pool:
+                    if pending:
+                        # assignment cannot be started even in empty pool, would wait forever
+                        self.abandon_assignment(pending)
+                        pending = None
+                    continue
+
+                # wait for any worker, poll server for new work after backoff time if pool is not saturated
+                idle = self.loop and (not pending) and (len(self.pool) < self.workers)
+                for conn in wait_connections(list(self.pool), timeout=self.backoff_time if idle else None):
+                    assignment, retval = self.pool_reap(conn)
+                    self.log.info("pool worker %s finished, retval=%d", assignment["id"], retval)
+                    self.spool.put(assignment["id"], retval, f"{assignment['id']}.zip")
+
+            if pending:  # pragma: no cover  ; running over multiprocessing
+                self.abandon_assignment(pending)
+
         self.log.info("exit")
         return retval
 
@@ -268,6 +583,28 @@ class AssignableAgent(AgentBase):
         return retval
 
 
+class PoolWorkerAgent(AgentBase):
+    """agent to execute single assignment in pool worker process"""
+
+    def run(self, **kwargs):
+        """process assignment passed from parent agent and report retval"""
+
+        with self.terminate_context():
+            retval = self.process_assignment(kwargs["assignment"])
+
+        kwargs["conn"].send(retval)
+        kwargs["conn"].close()
+        return retval
+
+
+def pool_worker(assignment, conn, loglevel):  # pragma: no cover  ; running over multiprocessing
+    """pool worker process entrypoint"""
+
+    configure_logging()
+    logging.getLogger(LOGGER_NAME).setLevel(loglevel)
+    PoolWorkerAgent().run(assignment=assignment, conn=conn)
+
+
 def main(argv=None):
     """sner agent main"""
 
@@ -289,6 +626,7 @@ def main(argv=None):
     parser.add_argument("--queue", help="specific queue selector")
     parser.add_argument("--caps", nargs="+", help="agent capabilities tags")
     parser.add_argument("--oneshot", action="store_true", help="process single assignment and exit")
+    parser.add_argument("--workers", type=int, help="number of concurrently processed assignments")
 
     args = parser.parse_args(argv)
     if args.debug:
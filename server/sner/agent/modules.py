@@ -23,8 +23,11 @@ import shlex
 import signal
 import subprocess
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from importlib import import_module
 from pathlib import Path
+from threading import Lock, RLock
+from time import monotonic, sleep
 
 import sner.plugin
 from sner.config import ConfigBase
@@ -54,10 +57,15 @@ class ModuleBase(ABC):
     """
 
     CONFIG_SCHEMA = Config
+    # return value of terminated module run
+    TERMINATED_RETVAL = -16
 
     def __init__(self):
         self.log = logging.getLogger(f"sner.agent.module.{self.__class__.__name__}")
-        self.process = None
+        self.processes = set()
+        # reentrant, terminate signal handler runs on main thread which might hold the lock already
+        self.processes_lock = RLock()
+        self.terminating = False
 
     def init_job(self, assignment):
         """initialize job, returns validated config"""
@@ -75,22 +83,68 @@ class ModuleBase(ABC):
     def _terminate(self):  # pragma: no cover  ; running over multiprocessing
         """terminate executed command"""
 
-        if self.process and (self.process.poll() is None):
-            try:
-                os.kill(self.process.pid, signal.SIGTERM)
-            except OSError as exc:
-                self.log.error(exc)
+        self.terminating = True
+        with self.processes_lock:
+            processes = list(self.processes)
+
+        for process in processes:
+            if process.poll() is None:
+                try:
+                    os.kill(process.pid, signal.SIGTERM)
+                except OSError as exc:
+                    self.log.error(exc)
 
     def _execute(self, cmd, output_file="output"):
         """execute command and capture output"""
 
         cmdarg = shlex.split(cmd) if isinstance(cmd, str) else cmd
         with open(output_file, "w", encoding="utf-8") as output_fd:
-            self.process = subprocess.Popen(cmdarg, stdin=subprocess.DEVNULL, stdout=output_fd, stderr=subprocess.STDOUT)  # noqa: E501  pylint: disable=consider-using-with
-            retval = self.process.wait()
-            self.process = None
+            # started under the lock, so all running commands are always registered (see auror_testssl children reaping)
+            with self.processes_lock:
+                process = subprocess.Popen(cmdarg, stdin=subprocess.DEVNULL, stdout=output_fd, stderr=subprocess.STDOUT)  # noqa: E501  pylint: disable=consider-using-with
+                self.processes.add(process)
+                # terminate might have been requested after the caller checked, but before the process was registered
+                if self.terminating:
+                    process.terminate()
+            try:
+                retval = process.wait()
+            finally:
+                with self.processes_lock:
+                    self.processes.discard(process)
         return retval
 
+    def _paced_map(self, func, items, workers=1, delay=0):
+        """
+        map func over items with bounded pool of workers, starts of the calls are spaced
+        by delay seconds across all workers. returns results in items order, items skipped
+        due to module termination yields None
+        """
+
+        pacing_lock = Lock()
+        next_start = [monotonic()]
+
+        def worker(item):
+            with pacing_lock:
+                start = max(next_start[0], monotonic())
+                next_start[0] = start + delay
+            sleep(max(0, start - monotonic()))
+
+            if self.terminating:  # pragma: no cover  ; not tested / running over multiprocessing
+                return None
+            return func(item)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(worker, items))
+
+    def _execute_many(self, jobs, workers=1, delay=0):
+        """
+        execute (cmd, output_file) jobs with bounded pool of workers, see _paced_map.
+        jobs skipped due to module termination yields -1
+        """
+
+        retvals = self._paced_map(lambda job: self._execute(*job), jobs, workers, delay)
+        return [-1 if retval is None else retval for retval in retvals]
+
     def enumerate_targets(self, assignment):
         """enumerate targetsv2 from assignment"""
 
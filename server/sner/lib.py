@@ -12,9 +12,10 @@ from ipaddress import ip_address, ip_network
 from pathlib import Path
 from zipfile import ZipFile
 
-import magic
 import yaml
 
+ZIP_MAGICS = (b"PK\x03\x04", b"PK\x05\x06")
+
 
 def load_yaml(filename):
     """load yaml from file, silence file not found"""
@@ -26,26 +27,59 @@ def load_yaml(filename):
 
 
 def is_zip(path):
-    """detect if path is zip archive"""
-    return magic.from_file(path, mime=True) == "application/zip"
+    """detect if path is zip archive by magic bytes"""
+
+    with open(path, "rb") as ftmp:
+        return ftmp.read(4) in ZIP_MAGICS
 
 
 def file_from_zip(zippath, filename):
     """extract file data from zipfile"""
 
-    with ZipFile(zippath) as ftmp_zip:
-        with ftmp_zip.open(filename) as ftmp:
-            return ftmp.read()
+    with ZipReader(zippath) as zreader:
+        return zreader.read(filename)
+
+
+class ZipReader:
+    """zip archive reader, archive is opened once and members are provided as binary streams or data"""
+
+    def __init__(self, path):
+        self.zipfile = ZipFile(path)  # pylint: disable=consider-using-with
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.zipfile.close()
+
+    def names(self, regexp=None):
+        """list member names, optionaly filtered by filename regexp"""
+
+        if regexp is None:
+            return self.zipfile.namelist()
+        matcher = re.compile(regexp)
+        return [name for name in self.zipfile.namelist() if matcher.match(name)]
+
+    def open(self, name):
+        """open member binary stream"""
+        return self.zipfile.open(name)
+
+    def read(self, name):
+        """read member data"""
+        return self.zipfile.read(name)
+
+    def streams(self, regexp):
+        """yield binary streams of members matching filename regexp"""
 
+        for name in self.names(regexp):
+            with self.zipfile.open(name) as stream:
+                yield stream
 
-def files_from_zip(zippath, regexp):
-    """extract files data from zipfile by filename regexp"""
+    def contents(self, regexp):
+        """yield data of members matching filename regexp"""
 
-    matcher = re.compile(regexp)
-    with ZipFile(zippath) as ftmp_zip:
-        for filename in ftmp_zip.namelist():
-            if matcher.match(filename):
-                yield file_from_zip(zippath, filename)
+        for name in self.names(regexp):
+            yield self.zipfile.read(name)
 
 
 def uri_ipv6_address(value):
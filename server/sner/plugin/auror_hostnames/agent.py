@@ -8,6 +8,7 @@ from typing import Literal
 from sner.agent.modules import ModuleBase
 from sner.config import ConfigBase
 from sner.plugin.auror_hostnames import core
+from sner.plugin.auror_hostnames.core import MIRROR_DIR, PARSE_WORKERS, RESOLVE_WORKERS
 
 
 class Config(ConfigBase):
@@ -16,6 +17,9 @@ class Config(ConfigBase):
     module: str = Literal["auror_hostnames"]
     git_key_path: str = "/etc/sner.auror_hostnames.pubkey"
     git_server: str = "server.hostname"
+    parse_workers: int = PARSE_WORKERS
+    resolve_workers: int = RESOLVE_WORKERS
+    mirror_dir: str = MIRROR_DIR
 
 
 class AgentModule(ModuleBase):
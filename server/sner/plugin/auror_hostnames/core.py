@@ -5,8 +5,9 @@ import ipaddress
 import json
 import logging
 import os
-import shutil
+import re
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from socket import getaddrinfo
 
@@ -15,6 +16,13 @@ import dns.zone
 
 logger = logging.getLogger(__name__)
 
+PROGRESS_INTERVAL = 1000
+PARSE_WORKERS = 4
+RESOLVE_WORKERS = 32
+# relative mirror dir is kept in agent working directory
+MIRROR_DIR = "auror_hostnames"
+INCLUDE_REGEX = re.compile(rb"^\$INCLUDE", re.IGNORECASE | re.MULTILINE)
+
 
 def get_repos(git_server, git_key_path) -> list:
     """
@@ -27,32 +35,97 @@ def get_repos(git_server, git_key_path) -> list:
     return repos
 
 
-def clone_dns_repos(git_server, repos, git_key_path):
-    """Clone DNS zones from git repository"""
+def sync_dns_repos(git_server, repos, git_key_path, repos_dir):
+    """Clone DNS zones git repositories into local mirror or update already mirrored ones"""
     env = os.environ.copy()
     env["GIT_SSH_COMMAND"] = f"ssh -i {git_key_path}"
     for repo in repos:
-        subprocess.run(["git", "clone", f"git@{git_server}:{repo}", f"dns-zones/{repo}"], check=True, env=env)
+        repo_path = Path(repos_dir) / repo
+        if (repo_path / ".git").exists():
+            subprocess.run(["git", "-C", str(repo_path), "fetch", "--quiet", "origin"], check=True, env=env)
+            subprocess.run(["git", "-C", str(repo_path), "reset", "--quiet", "--hard", "FETCH_HEAD"], check=True, env=env)
+        else:
+            subprocess.run(["git", "clone", f"git@{git_server}:{repo}", str(repo_path)], check=True, env=env)
+
 
+def get_zone_blobs(repos_dir, repos) -> dict:
+    """
+    Get DNS zone files from mirrored git repos
 
-def get_zone_file_paths() -> set:
+    Returns:
+        dict: { zone file path: git blob hash }
     """
-    Get DNS zone names from git repos
+    zone_blobs = {}
+    for repo in repos:
+        repo_path = Path(repos_dir) / repo
+        output = subprocess.check_output(["git", "-C", str(repo_path), "ls-files", "--stage", "--", "*.zone"], text=True)
+        for line in output.splitlines():
+            meta, path = line.split("\t", 1)
+            zone_blobs[str(repo_path / path)] = meta.split()[1]
+
+    return zone_blobs
+
+
+class ZoneCache:
+    """
+    Parsed zone file records cache keyed by zone file git blob hash
+
+    Zone files using $INCLUDE are not cached, included files are not part of the key.
     """
-    repos_folder = Path("dns-zones")
-    zone_file_paths = set()
-    for zone_file in repos_folder.glob("**/*.zone"):
-        zone_file_paths.add(str(zone_file))
 
-    return zone_file_paths
+    def __init__(self, cache_dir, zone_blobs):
+        self.cache_dir = Path(cache_dir)
+        self.zone_blobs = zone_blobs
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.includes = {}
+
+    def cacheable(self, zone_file_path):
+        """check if zone file records can be cached"""
+
+        if zone_file_path not in self.includes:
+            self.includes[zone_file_path] = bool(INCLUDE_REGEX.search(Path(zone_file_path).read_bytes()))
+        return not self.includes[zone_file_path]
+
+    def _path(self, zone_file_path):
+        """cache file path for zone file, origin may be derived from file name, hence it's part of the key"""
+        return self.cache_dir / f"{self.zone_blobs[zone_file_path]}-{Path(zone_file_path).name}.json"
+
+    def get(self, zone_file_path):
+        """get cached records or None"""
+
+        if not self.cacheable(zone_file_path):
+            return None
+        try:
+            cnames, a_aaaa, ptrs, ip_hostnames = json.loads(self._path(zone_file_path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return [cnames, {k: set(v) for k, v in a_aaaa.items()}, ptrs, {k: set(v) for k, v in ip_hostnames.items()}]
+
+    def put(self, zone_file_path, records):
+        """store zone records"""
+
+        if not self.cacheable(zone_file_path):
+            return
+        cnames, a_aaaa, ptrs, ip_hostnames = records
+        data = [cnames, {k: sorted(v) for k, v in a_aaaa.items()}, ptrs, {k: sorted(v) for k, v in ip_hostnames.items()}]
+        self._path(zone_file_path).write_text(json.dumps(data), encoding="utf-8")
+
+    def prune(self):
+        """remove records of zone files versions no longer present"""
+
+        current = {self._path(path) for path in self.zone_blobs}
+        for path in self.cache_dir.glob("*.json"):
+            if path not in current:
+                path.unlink()
 
 
-def process_cnames(cnames, a_aaaa, ip_hostnames) -> dict:
+def process_cnames(cnames, a_aaaa, ip_hostnames, workers=1) -> dict:  # pylint: disable=too-many-locals,too-many-branches
     """Remove chaining of CNAME records, try to resolve IPs for aliases
 
     Args:
         cnames (dict): { alias: cname }
         a_aaaa (dict): { hostname: [ip1, ip2] }
+        workers (int): number of concurrent resolver threads
 
     Returns:
         dict: { ip: [alias, alias] }
@@ -72,6 +145,14 @@ def process_cnames(cnames, a_aaaa, ip_hostnames) -> dict:
     for alias, cname in dechained_cnames.items():
         cnames_rev.setdefault(cname, set()).add(alias)
 
+    # resolve all required names at once, each name only once
+    resolve = set()
+    for cname, aliases in cnames_rev.items():
+        if cname not in a_aaaa:
+            resolve.add(cname)
+            resolve.update(aliases)
+    resolved = resolve_hostnames(resolve, workers)
+
     #  add IPs from A/AAAA records for aliases if its CNAME is among A/AAAA records
     cnames_in_a_aaaa = 0
     resolved_cnames = 0
@@ -83,14 +164,12 @@ def process_cnames(cnames, a_aaaa, ip_hostnames) -> dict:
                     ip_hostnames.setdefault(ip, set()).add(alias)
                     cnames_in_a_aaaa += 1
         else:
-            ips = resolve_hostname(cname)
             resolved_cnames += 1
-            for ip in ips:
+            for ip in resolved[cname]:
                 ip_hostnames.setdefault(ip, set()).add(cname)
             for alias in aliases:
                 resolve_aliases += 1
-                ips = resolve_hostname(alias)
-                for ip in ips:
+                for ip in resolved[alias]:
                     ip_hostnames.setdefault(ip, set()).add(alias)
 
     logger.info("Found %s CNAMEs in A/AAAA records", cnames_in_a_aaaa)
@@ -116,6 +195,26 @@ def resolve_hostname(hostname):
     return ips
 
 
+def resolve_hostnames(hostnames, workers=1) -> dict:
+    """Resolve hostnames concurrently
+    Args:
+        hostnames (iterable): hostnames, duplicates are resolved only once
+        workers (int): number of concurrent resolver threads
+    Returns:
+        dict: { hostname: [ip1, ip2] }
+    """
+    hostnames = sorted(set(hostnames))
+    resolved = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for hostname, ips in zip(hostnames, executor.map(resolve_hostname, hostnames), strict=True):
+            resolved[hostname] = ips
+            if len(resolved) % PROGRESS_INTERVAL == 0:
+                logger.info("Resolved %s/%s hostnames", len(resolved), len(hostnames))
+
+    return resolved
+
+
 def process_ptrs(ptrs, ip_hostnames) -> dict:
     """
     Convert PTR records to IP addresses with hostnames
@@ -216,6 +315,44 @@ def get_records(zone_file_path) -> list:  # pylint: disable=too-many-locals
     return [cnames, a_aaaa, ptrs, ip_hostnames]
 
 
+def parse_zone_files(zone_file_paths, workers=1, cache=None) -> list:
+    """Parse zone files in process pool and merge the records
+
+    Args:
+        zone_file_paths (iterable): zone file paths
+        workers (int): number of parser processes
+        cache (ZoneCache): optional cache, only zone files missing in cache are parsed
+    Returns:
+        list: merged [cnames, a_aaaa, ptrs, ip_hostnames], see get_records
+    """
+    zone_file_paths = sorted(zone_file_paths)
+    results = {}
+    if cache:
+        for path in zone_file_paths:
+            if (records := cache.get(path)) is not None:
+                results[path] = records
+    parse_paths = [path for path in zone_file_paths if path not in results]
+    logger.info("Parsing %s zone files, %s cached", len(parse_paths), len(results))
+
+    if parse_paths:
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+            chunksize = max(1, len(parse_paths) // (max(1, workers) * 4))
+            parsed = executor.map(get_records, parse_paths, chunksize=chunksize)
+            for idx, (path, records) in enumerate(zip(parse_paths, parsed, strict=True), start=1):
+                results[path] = records
+                if cache:
+                    cache.put(path, records)
+                if idx % PROGRESS_INTERVAL == 0:
+                    logger.info("Parsed %s/%s zone files", idx, len(parse_paths))
+
+    merged = [{}, {}, {}, {}]
+    for path in zone_file_paths:
+        for records, zone_records in zip(merged, results[path], strict=True):
+            records.update(zone_records)
+
+    return merged
+
+
 def check_git_key_path(git_key_path):
     """Check if git key path exists"""
     if not os.path.exists(git_key_path):
@@ -233,32 +370,26 @@ def run(assignment):  # pragma: no cover
         logger.error("Git key file does not exist")
         return 1
 
+    # module runs in job directory, relative mirror dir is resolved against agent working directory
+    mirror_dir = Path.cwd().parent / assignment["config"].get("mirror_dir", MIRROR_DIR)
     repos = get_repos(git_server, git_key_path)
-    clone_dns_repos(git_server, repos, git_key_path)
-    zone_file_paths = get_zone_file_paths()
-
-    cnames = {}
-    a_aaaa = {}
-    ptrs = {}
-    ip_hostnames = {}
+    sync_dns_repos(git_server, repos, git_key_path, mirror_dir / "repos")
+    zone_blobs = get_zone_blobs(mirror_dir / "repos", repos)
+    cache = ZoneCache(mirror_dir / "cache", zone_blobs)
 
-    for zone_file_path in zone_file_paths:
-        result = get_records(zone_file_path)
-        cnames.update(result[0])
-        a_aaaa.update(result[1])
-        ptrs.update(result[2])
-        ip_hostnames.update(result[3])
+    logger.info("Found %s zone files", len(zone_blobs))
+    cnames, a_aaaa, ptrs, ip_hostnames = parse_zone_files(zone_blobs, assignment["config"].get("parse_workers", PARSE_WORKERS), cache)
+    cache.prune()
 
     logger.info("Found %s CNAME records", len(cnames))
     logger.info("Found %s A/AAAA records", len(a_aaaa))
     logger.info("Found %s PTR records", len(ptrs))
 
     ip_hostnames = process_ptrs(ptrs, ip_hostnames)
-    ip_hostnames = process_cnames(cnames, a_aaaa, ip_hostnames)
+    ip_hostnames = process_cnames(cnames, a_aaaa, ip_hostnames, assignment["config"].get("resolve_workers", RESOLVE_WORKERS))
     ip_hostnames = {k: list(v) for k, v in ip_hostnames.items()}
 
     logger.info("Found hostnames for %s IP addresses", len(ip_hostnames))
 
-    shutil.rmtree("dns-zones")
     Path("output.json").write_text(json.dumps(ip_hostnames, indent=4), encoding="utf-8")
     return 0
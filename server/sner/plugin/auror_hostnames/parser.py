@@ -9,13 +9,15 @@ from datetime import datetime
 from pathlib import Path
 from pprint import pprint
 
-from sner.lib import file_from_zip, is_zip
+from sner.lib import ZipReader, is_zip
 from sner.server.parser import ParsedItemsDb, ParserBase
 
 
 class ParserModule(ParserBase):
     """auror_hostnames output parser"""
 
+    VERSION = 1
+
     @classmethod
     def parse_path(cls, path):
         """parse path and returns list of hosts/addresses"""
@@ -24,7 +26,8 @@ class ParserModule(ParserBase):
         now = datetime.now()
 
         if is_zip(path):
-            data = file_from_zip(path, "output.json")
+            with ZipReader(path) as zreader:
+                data = zreader.read("output.json")
         else:
             data = Path(path).read_text(encoding="utf-8")
 
@@ -22,6 +22,7 @@ class Config(ConfigBase):
     args: list[str] = ["--full"]
     connect_timeout: int = 5
     openssl_timeout: int = 5
+    workers: int = 1
 
 
 class AgentModule(ModuleBase):  # pragma: cover-ignore-if-not-pytestslow
@@ -34,10 +35,6 @@ class AgentModule(ModuleBase):  # pragma: cover-ignore-if-not-pytestslow
 
     CONFIG_SCHEMA = Config
 
-    def __init__(self):
-        super().__init__()
-        self.loop = True
-
     def _filter_exit_codes(self, value):
         """Cope with testssl return values, not all !=0 values means job really failed
         https://github.com/drwetter/testssl.sh/blob/3.2/doc/testssl.1.md#exit-status
@@ -62,19 +59,30 @@ class AgentModule(ModuleBase):  # pragma: cover-ignore-if-not-pytestslow
         return value
 
     def _wait_children(self):
-        """Wait for zombie grandchildren left behind by testssl.sh."""
+        """Wait for zombie grandchildren left behind by testssl.sh, running commands are reaped by their own wait."""
 
         # Since https://github.com/testssl/testssl.sh/commit/d1531cdf60f0ce0d55c4d4a1b2fa5de114cbc682
         # testssl.sh leaks zombie processes likely due to process substitutions <(...) used inside
         # command substitutions $(...). When run from an interactive shell, the shell's job control
         # reaps them silently. When run from a long-running Python process, we must reap them explicitly.
-        while True:
-            try:
-                pid, _ = os.waitpid(-1, os.WNOHANG)
-                if pid == 0:
-                    break  # children exist but none have exited yet
-            except ChildProcessError:
-                break  # no children left at all
+        with self.processes_lock:
+            running = {process.pid for process in self.processes}
+            while True:
+                try:
+                    # peek only, reaping running command would steal its exit status
+                    child = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+                except ChildProcessError:
+                    break  # no children left at all
+                if (child is None) or (child.si_pid in running):
+                    break  # children exist but none have exited yet, or running command exited and is left for its wait
+                os.waitpid(child.si_pid, 0)
+
+    def _execute_reap(self, job):
+        """execute (cmd, output_file) job and reap children left behind"""
+
+        retval = self._execute(*job)
+        self._wait_children()
+        return retval
 
     def run(self, assignment):
         """Run the agent.
@@ -87,7 +95,7 @@ class AgentModule(ModuleBase):  # pragma: cover-ignore-if-not-pytestslow
         """
 
         asg_config = self.init_job(assignment)
-        ret = 0
+        jobs = []
 
         for idx, target in self.enumerate_targets(assignment):
             params = [
@@ -118,17 +126,21 @@ class AgentModule(ModuleBase):  # pragma: cover-ignore-if-not-pytestslow
             cmd = params + asg_config.args + target_args
 
             logger.debug("Running command: %s", " ".join(cmd))
-            ret |= self._filter_exit_codes(self._execute(cmd, f"output-{idx}"))
-            self._wait_children()
+            jobs.append((cmd, f"output-{idx}"))
+
+        ret = 0
+        for retval in self._paced_map(self._execute_reap, jobs, asg_config.workers):
+            if retval is not None:
+                ret |= self._filter_exit_codes(retval)
+        # zombies left while other commands were running
+        self._wait_children()
 
-            if not self.loop:  # pragma: no cover  ; not tested
-                ret = -16
-                break
+        if self.terminating:  # pragma: no cover  ; not tested
+            ret = self.TERMINATED_RETVAL
 
         return ret
 
     def terminate(self):  # pragma: no cover  ; not tested / running over multiprocessing
         """terminate scanner if running"""
 
-        self.loop = False
         self._terminate()
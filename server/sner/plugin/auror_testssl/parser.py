@@ -10,7 +10,7 @@ import sys
 from pathlib import Path
 from pprint import pprint
 
-from sner.lib import files_from_zip, is_zip
+from sner.lib import ZipReader, is_zip
 from sner.server.parser import ParsedItemsDb, ParserBase
 
 logger = logging.getLogger(__name__)
@@ -34,10 +34,12 @@ class ParserModule(ParserBase):  # pylint: disable=too-few-public-methods
     """auror_testssl parser class
 
     Attributes:
+        VERSION (int): Parser version, see ParserBase.
         ARCHIVE_PATHS (str): The regex pattern for archive paths.
         FINDINGS_IGNORE (list): A list of findings to ignore.
     """
 
+    VERSION = 1
     ARCHIVE_PATHS = r"output\-[0-9]+\.json"
     FINDINGS_IGNORE = []
 
@@ -55,8 +57,9 @@ class ParserModule(ParserBase):  # pylint: disable=too-few-public-methods
         pidb = ParsedItemsDb()
 
         if is_zip(path):
-            for filedata in files_from_zip(path, cls.ARCHIVE_PATHS):
-                pidb = cls._parse_data(filedata.decode("utf-8"), pidb)
+            with ZipReader(path) as zreader:
+                for filedata in zreader.contents(cls.ARCHIVE_PATHS):
+                    pidb = cls._parse_data(filedata.decode("utf-8"), pidb)
             return pidb
 
         return cls._parse_data(Path(path).read_text(encoding="utf-8"), pidb)
@@ -7,20 +7,23 @@ import json
 import sys
 from pprint import pprint
 
-from sner.lib import file_from_zip
+from sner.lib import ZipReader
 from sner.server.parser import ParsedItemsDb, ParserBase
 
 
 class ParserModule(ParserBase):
     """dummy parser"""
 
+    VERSION = 1
+
     @classmethod
     def parse_path(cls, path):
         """parse path and returns list of hosts/addresses"""
 
         pidb = ParsedItemsDb()
 
-        assignment = json.loads(file_from_zip(path, "assignment.json"))
+        with ZipReader(path) as zreader:
+            assignment = json.loads(zreader.read("assignment.json"))
         for target in assignment["targets"]:
             pidb.upsert_host(target)
 
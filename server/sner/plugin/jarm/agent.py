@@ -14,7 +14,9 @@ class Config(ConfigBase):
     """jarm agent plugin config"""
 
     module: str = Literal["jarm"]
+    # pause after each target, per worker
     delay: int = 0
+    workers: int = 1
 
 
 class AgentModule(ModuleBase):
@@ -27,15 +29,11 @@ class AgentModule(ModuleBase):
 
     CONFIG_SCHEMA = Config
 
-    def __init__(self):
-        super().__init__()
-        self.loop = True
-
     def run(self, assignment):
         """run the agent"""
 
         asg_config = self.init_job(assignment)
-        ret = 0
+        jobs = []
 
         for idx, target in self.enumerate_targets(assignment):
             if target.proto != "tcp":
@@ -43,18 +41,26 @@ class AgentModule(ModuleBase):
                 continue
 
             target_args = ["-p", str(target.port), target.address]
-            cmd = ["jarm", "-v"] + target_args
+            jobs.append((["jarm", "-v"] + target_args, f"output-{idx}.out"))
 
-            ret |= self._execute(cmd, f"output-{idx}.out")
-            sleep(asg_config.delay)
+        ret = 0
+        for retval in self._paced_map(lambda job: self._execute_pause(job, asg_config.delay), jobs, asg_config.workers):
+            if retval is not None:
+                ret |= retval
 
-            if not self.loop:  # pragma: no cover  ; not tested
-                break
+        if self.terminating:  # pragma: no cover  ; not tested
+            ret = self.TERMINATED_RETVAL
 
         return ret
 
+    def _execute_pause(self, job, delay):
+        """execute (cmd, output_file) job and pause"""
+
+        retval = self._execute(*job)
+        sleep(delay)
+        return retval
+
     def terminate(self):  # pragma: no cover  ; not tested / running over multiprocessing
         """terminate scanner if running"""
 
-        self.loop = False
         self._terminate()
@@ -6,13 +6,14 @@ parsers to import from agent outputs to storage
 import sys
 from pprint import pprint
 
-from sner.lib import files_from_zip
+from sner.lib import ZipReader
 from sner.server.parser import ParsedItemsDb, ParserBase
 
 
 class ParserModule(ParserBase):
     """jarm output parser"""
 
+    VERSION = 1
     ARCHIVE_PATHS = r"output-[0-9]+.out"
 
     @classmethod
@@ -21,8 +22,9 @@ class ParserModule(ParserBase):
 
         pidb = ParsedItemsDb()
 
-        for filedata in files_from_zip(path, cls.ARCHIVE_PATHS):
-            pidb = cls._parse_data(filedata.decode("utf-8"), pidb)
+        with ZipReader(path) as zreader:
+            for filedata in zreader.contents(cls.ARCHIVE_PATHS):
+                pidb = cls._parse_data(filedata.decode("utf-8"), pidb)
 
         return pidb
 
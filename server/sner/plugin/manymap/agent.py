@@ -3,6 +3,7 @@
 sner agent manymap module
 """
 
+from collections import defaultdict
 from time import sleep
 from typing import Literal
 
@@ -17,6 +18,7 @@ class Config(ConfigBase):
     module: str = Literal["manymap"]
     args: list[str]
     delay: int = 0
+    batch: bool = False
 
 
 class AgentModule(ModuleBase):
@@ -33,24 +35,45 @@ class AgentModule(ModuleBase):
         super().__init__()
         self.loop = True
 
-    def run(self, assignment):
-        """run the agent"""
+    @staticmethod
+    def ports_spec(targets):
+        """nmap port list for targets, eg. T:22,80,U:53"""
 
-        asg_config = self.init_job(assignment)
-        ret = 0
+        ports = defaultdict(list)
+        for target in targets:
+            ports[target.proto[0].upper()].append(str(target.port))
+        return ",".join(f"{proto}:{','.join(items)}" for proto, items in sorted(ports.items()))
+
+    def scan_groups(self, assignment, batch):
+        """
+        yield scan groups (idx, targets), one per target or targets grouped by
+        address (and address family) in batch mode. idx of the first target names the output
+        """
 
+        groups = defaultdict(list)
         for idx, target in self.enumerate_targets(assignment):
             if not isinstance(target, ServiceTarget):
                 self.log.warning("ignored non-ServiceTarget %s", target)
                 continue
+            groups[(target.is_ipv6_address(), target.address) if batch else idx].append((idx, target))
+
+        for group in groups.values():
+            yield group[0][0], [target for _, target in group]
+
+    def run(self, assignment):
+        """run the agent"""
+
+        asg_config = self.init_job(assignment)
+        ret = 0
 
+        for idx, targets in self.scan_groups(assignment, asg_config.batch):
             output_args = ["-oA", f"output-{idx}", "--reason"]
 
-            target_args = ["-p", f"{target.proto[0].upper()}:{target.port}"]
-            if target.is_ipv6_address():
-                target_args += ["-6", target.address]
+            target_args = ["-p", self.ports_spec(targets)]
+            if targets[0].is_ipv6_address():
+                target_args += ["-6", targets[0].address]
             else:
-                target_args += [target.address]
+                target_args += [targets[0].address]
 
             cmd = ["nmap"] + asg_config.args + output_args + target_args
             ret |= self._execute(cmd, f"output-{idx}")
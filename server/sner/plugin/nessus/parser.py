@@ -5,12 +5,11 @@ parsers to import from agent outputs to storage
 
 import json
 import sys
-from io import BytesIO
 from pprint import pprint
 
 from tenable.reports import NessusReportv2
 
-from sner.lib import file_from_zip, is_address, is_zip
+from sner.lib import ZipReader, is_address, is_zip
 from sner.server.parser import ParsedItemsDb, ParserBase
 from sner.server.storage.models import SeverityEnum
 from sner.server.utils import SnerJSONEncoder
@@ -19,6 +18,7 @@ from sner.server.utils import SnerJSONEncoder
 class ParserModule(ParserBase):
     """nessus .nessus output parser"""
 
+    VERSION = 1
     SEVERITY_MAP = ["info", "low", "medium", "high", "critical"]
 
     @classmethod
@@ -26,8 +26,8 @@ class ParserModule(ParserBase):
         """parse path"""
 
         if is_zip(path):
-            filedata = file_from_zip(path, "output.nessus")
-            return cls._parse_report(NessusReportv2(BytesIO(filedata)))
+            with ZipReader(path) as zreader, zreader.open("output.nessus") as stream:
+                return cls._parse_report(NessusReportv2(stream))
 
         return cls._parse_report(NessusReportv2(path))
 
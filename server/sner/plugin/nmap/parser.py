@@ -6,19 +6,22 @@ parsers to import from agent outputs to storage
 import json
 import sys
 from datetime import datetime
-from pathlib import Path
 from pprint import pprint
 from time import time
+from xml.etree.ElementTree import ParseError
 
-import libnmap.parser
+import defusedxml.ElementTree
+from defusedxml import DefusedXmlException
+from libnmap.parser import NmapParser, NmapParserException
 
-from sner.lib import files_from_zip, is_zip
+from sner.lib import ZipReader, is_zip
 from sner.server.parser import ParsedItemsDb, ParserBase
 
 
 class ParserModule(ParserBase):
     """nmap xml output parser"""
 
+    VERSION = 1
     ARCHIVE_PATHS = r"output\.xml|output6\.xml"
 
     @classmethod
@@ -28,83 +31,100 @@ class ParserModule(ParserBase):
         pidb = ParsedItemsDb()
 
         if is_zip(path):
-            for filedata in files_from_zip(path, cls.ARCHIVE_PATHS):
-                pidb = cls._parse_data(filedata.decode("utf-8"), pidb)
+            with ZipReader(path) as zreader:
+                for stream in zreader.streams(cls.ARCHIVE_PATHS):
+                    pidb = cls._parse_stream(stream, pidb)
             return pidb
 
-        return cls._parse_data(Path(path).read_text(encoding="utf-8"), pidb)
+        with open(path, "rb") as stream:
+            return cls._parse_stream(stream, pidb)
 
     @classmethod
-    def _parse_data(cls, data, pidb):
-        """parse raw string data"""
-
-        report = libnmap.parser.NmapParser.parse_fromstring(data)
-
-        for ihost in report.hosts:
-            # metadata
-            via_target = ihost.user_target_hostname or ihost.address
-            import_time = datetime.fromtimestamp(int(ihost.starttime or time()))
-
-            # parse host
-            host_data = {}
-            if ihost.hostnames:
-                host_data["hostname"] = ihost.hostnames[0]
-
-            for osmatch in [item for item in ihost.os_match_probabilities() if item.accuracy == 100]:
-                host_data["os"] = osmatch.name
-                pidb.upsert_note(ihost.address, None, None, None, "cpe", data=json.dumps(osmatch.get_cpe()), import_time=import_time)
-
-            pidb.upsert_host(ihost.address, **host_data)
-
-            # parse host scripts
-            for iscript in ihost.scripts_results:
-                pidb.upsert_note(ihost.address, None, None, via_target, f"nmap.{iscript['id']}", data=json.dumps(iscript), import_time=import_time)
-
-            # parse services
-            for iservice in ihost.services:
-                service_data = {"state": f"{iservice.state}:{iservice.reason}", "import_time": import_time}
-                if iservice.service:
-                    service_data["name"] = iservice.service
-                if iservice.banner:
-                    service_data["info"] = iservice.banner
-                pidb.upsert_service(ihost.address, iservice.protocol, iservice.port, **service_data)
-
-                if iservice.cpelist:
-                    pidb.upsert_note(
-                        ihost.address,
-                        iservice.protocol,
-                        iservice.port,
-                        via_target,
-                        "cpe",
-                        data=json.dumps([x.cpestring for x in iservice.cpelist]),
-                        import_time=import_time,
-                    )
-
-                if iservice.banner_dict:
-                    pidb.upsert_note(
-                        ihost.address,
-                        iservice.protocol,
-                        iservice.port,
-                        via_target,
-                        "nmap.banner_dict",
-                        data=json.dumps(iservice.banner_dict),
-                        import_time=import_time,
-                    )
-
-                # parse service scripts
-                for iscript in iservice.scripts_results:
-                    pidb.upsert_note(
-                        ihost.address,
-                        iservice.protocol,
-                        iservice.port,
-                        via_target,
-                        f"nmap.{iscript['id']}",
-                        data=json.dumps(iscript),
-                        import_time=import_time,
-                    )
+    def _parse_stream(cls, stream, pidb):
+        """
+        parse xml data from binary stream incrementally. each <host> element is parsed
+        as soon as it's read and released afterwards, so the whole report is never held in memory
+        """
+
+        try:
+            context = defusedxml.ElementTree.iterparse(stream, events=("start", "end"))
+            _, root = next(context)
+            for event, elem in context:
+                if (event == "end") and (elem.tag == "host"):
+                    cls._parse_host(NmapParser._parse_xml_host(elem), pidb)  # pylint: disable=protected-access
+                    root.clear()
+        except (ParseError, DefusedXmlException, StopIteration) as exc:
+            # keep libnmap exception type for callers
+            raise NmapParserException(f"Wrong XML structure: cannot parse data: {exc}") from None
 
         return pidb
 
+    @staticmethod
+    def _parse_host(ihost, pidb):
+        """parse libnmap host object"""
+
+        # metadata
+        via_target = ihost.user_target_hostname or ihost.address
+        import_time = datetime.fromtimestamp(int(ihost.starttime or time()))
+
+        # parse host
+        host_data = {}
+        if ihost.hostnames:
+            host_data["hostname"] = ihost.hostnames[0]
+
+        for osmatch in [item for item in ihost.os_match_probabilities() if item.accuracy == 100]:
+            host_data["os"] = osmatch.name
+            pidb.upsert_note(ihost.address, None, None, None, "cpe", data=json.dumps(osmatch.get_cpe()), import_time=import_time)
+
+        pidb.upsert_host(ihost.address, **host_data)
+
+        # parse host scripts
+        for iscript in ihost.scripts_results:
+            pidb.upsert_note(ihost.address, None, None, via_target, f"nmap.{iscript['id']}", data=json.dumps(iscript), import_time=import_time)
+
+        # parse services
+        for iservice in ihost.services:
+            service_data = {"state": f"{iservice.state}:{iservice.reason}", "import_time": import_time}
+            if iservice.service:
+                service_data["name"] = iservice.service
+            if iservice.banner:
+                service_data["info"] = iservice.banner
+            pidb.upsert_service(ihost.address, iservice.protocol, iservice.port, **service_data)
+
+            if iservice.cpelist:
+                pidb.upsert_note(
+                    ihost.address,
+                    iservice.protocol,
+                    iservice.port,
+                    via_target,
+                    "cpe",
+                    data=json.dumps([x.cpestring for x in iservice.cpelist]),
+                    import_time=import_time,
+                )
+
+            if iservice.banner_dict:
+                pidb.upsert_note(
+                    ihost.address,
+                    iservice.protocol,
+                    iservice.port,
+                    via_target,
+                    "nmap.banner_dict",
+                    data=json.dumps(iservice.banner_dict),
+                    import_time=import_time,
+                )
+
+            # parse service scripts
+            for iscript in iservice.scripts_results:
+                pidb.upsert_note(
+                    ihost.address,
+                    iservice.protocol,
+                    iservice.port,
+                    via_target,
+                    f"nmap.{iscript['id']}",
+                    data=json.dumps(iscript),
+                    import_time=import_time,
+                )
+
 
 if __name__ == "__main__":  # pragma: no cover
     pprint(ParserModule.parse_path(sys.argv[1]).__dict__)
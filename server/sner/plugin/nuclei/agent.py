@@ -43,7 +43,7 @@ class AgentModule(ModuleBase):
             targets.append(target.value)
         Path("targets").write_text("\n".join(targets), encoding="utf-8")
 
-        output_args = ["-nc", "-je", "output.json", "-se", "output.sarif.json", "-o", "output"]
+        output_args = ["-nc", "-jle", "output.jsonl", "-se", "output.sarif.json", "-o", "output"]
         target_args = ["-l", "targets"]
         cmd = ["nuclei"] + target_args + asg_config.args + output_args
 
@@ -5,11 +5,11 @@ parsers to import from agent outputs to storage
 
 import json
 import logging
+from hashlib import blake2b
 from ipaddress import ip_address
-from pathlib import Path
 from urllib.parse import urlsplit
 
-from sner.lib import file_from_zip, get_nested_key, is_address, is_zip
+from sner.lib import ZipReader, get_nested_key, is_address, is_zip
 from sner.server.parser import ParsedItemsDb, ParserBase
 from sner.server.storage.models import SeverityEnum
 from sner.server.utils import SnerJSONEncoder
@@ -37,6 +37,8 @@ def dnsptr_to_ip(dnsptr: str) -> str:
 class ParserModule(ParserBase):
     """nuclei output parser"""
 
+    VERSION = 1
+
     @classmethod
     def parse_path(cls, path):
         """parse data from path"""
@@ -44,33 +46,63 @@ class ParserModule(ParserBase):
         pidb = ParsedItemsDb()
 
         if is_zip(path):
-            return cls._parse_data(file_from_zip(path, "output.json"), pidb)
-
-        return cls._parse_data(Path(path).read_text(encoding="utf-8"), pidb)
+            with ZipReader(path) as zreader:
+                if "output.jsonl" in zreader.names():
+                    with zreader.open("output.jsonl") as stream:
+                        return cls._parse_lines(stream, pidb)
+                # output of agents before jsonl export
+                return cls._parse_data(zreader.read("output.json"), pidb)
+
+        with open(path, "rb") as stream:
+            if path.endswith(".jsonl"):
+                return cls._parse_lines(stream, pidb)
+            return cls._parse_data(stream.read(), pidb)
 
     @classmethod
     def _parse_data(cls, data, pidb):
-        """parse taw string data"""
+        """parse raw json array data"""
+
+        for report in json.loads(data):
+            pidb = cls._parse_report(report, pidb)
 
-        data = json.loads(data)
+        return pidb
 
-        for report in data:
-            report_ident = f"{report['type']}/{report['template-id']}"
+    @classmethod
+    def _parse_lines(cls, stream, pidb):
+        """parse json lines from binary stream line by line, duplicate lines are parsed only once"""
 
-            # pull dns ptr info
-            if report_ident == "dns/ptr-fingerprint":
-                pidb = cls._parse_dnsptr(report, pidb)
+        seen = set()
+        for line in stream:
+            line = line.strip()
+            if not line:
                 continue
 
-            # skip some templates
-            if "ip" not in report:
-                logger.warning("IP missing in report, template ident: %s", report_ident)
+            digest = blake2b(line, digest_size=16).digest()
+            if digest in seen:
                 continue
+            seen.add(digest)
 
-            pidb = cls._parse_normal(report, pidb)
+            pidb = cls._parse_report(json.loads(line), pidb)
 
         return pidb
 
+    @classmethod
+    def _parse_report(cls, report, pidb):
+        """parse single report"""
+
+        report_ident = f"{report['type']}/{report['template-id']}"
+
+        # pull dns ptr info
+        if report_ident == "dns/ptr-fingerprint":
+            return cls._parse_dnsptr(report, pidb)
+
+        # skip some templates
+        if "ip" not in report:
+            logger.warning("IP missing in report, template ident: %s", report_ident)
+            return pidb
+
+        return cls._parse_normal(report, pidb)
+
     @classmethod
     def _parse_dnsptr(cls, report, pidb):
         """parse dns/ptr-fingerprint"""
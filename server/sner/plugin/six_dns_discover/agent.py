@@ -4,9 +4,10 @@ sner agent ipv6 (via ipv4 enum ptr) dns discovery module
 """
 
 import json
+from concurrent.futures import Future
 from pathlib import Path
 from socket import AF_INET6, getaddrinfo, gethostbyaddr
-from time import sleep
+from threading import Lock
 from typing import Literal, Union
 
 from sner.agent.modules import ModuleBase
@@ -19,6 +20,7 @@ class Config(ConfigBase):
 
     module: str = Literal["six_dns_discover"]
     delay: Union[int, float] = 1
+    workers: int = 1
 
 
 class AgentModule(ModuleBase):
@@ -33,41 +35,66 @@ class AgentModule(ModuleBase):
 
     def __init__(self):
         super().__init__()
-        self.loop = True
+        self.ptr_cache = {}
+        self.aaaa_cache = {}
+        self.cache_lock = Lock()
+
+    def _cached(self, cache, func, key):
+        """
+        resolve key with func, cache holds futures so the concurrent lookups of the same key
+        wait for the first one to complete. failed resolutions are cached as None
+        """
+
+        with self.cache_lock:
+            if owner := key not in cache:
+                cache[key] = Future()
+            future = cache[key]
+
+        if owner:
+            try:
+                future.set_result(func(key))
+            except OSError:
+                future.set_result(None)
+            except Exception as exc:
+                future.set_exception(exc)
+                raise
+        return future.result()
 
     @staticmethod
-    def find_ipv6_by_hostname(ipv4_address):
-        """find ipv6 addresses by same hostname of PTR and AAAA"""
-        result = []
+    def resolve_ptr(address):
+        """resolve PTR hostname"""
+        return gethostbyaddr(address)[0]
+
+    @staticmethod
+    def resolve_aaaa(hostname):
+        """resolve ipv6 addresses of hostname"""
+        return [sockaddr[0] for _, _, _, _, sockaddr in getaddrinfo(hostname, None, AF_INET6)]
 
-        try:
-            (hostname, _, _) = gethostbyaddr(ipv4_address)
-            resolved_addrs = getaddrinfo(hostname, None, AF_INET6)
-            for _, _, _, _, sockaddr in resolved_addrs:
-                result.append((sockaddr[0], hostname, ipv4_address))
-        except OSError:
-            pass
+    def find_ipv6_by_hostname(self, ipv4_address):
+        """find ipv6 addresses by same hostname of PTR and AAAA"""
 
-        return result
+        hostname = self._cached(self.ptr_cache, self.resolve_ptr, ipv4_address)
+        if not hostname:
+            return []
+        return [(v6addr, hostname, ipv4_address) for v6addr in self._cached(self.aaaa_cache, self.resolve_aaaa, hostname) or []]
 
     # pylint: disable=duplicate-code
     def run(self, assignment):
         """run the agent"""
         asg_config = self.init_job(assignment)
 
+        addrs = list(
+            dict.fromkeys(target.value if isinstance(target, GenericTarget) else target.address for _, target in self.enumerate_targets(assignment))
+        )
+
         result = {}
-        for _, target in self.enumerate_targets(assignment):
-            addr = target.value if isinstance(target, GenericTarget) else target.address
-            for v6addr, hostname, via_ipv4 in self.find_ipv6_by_hostname(addr):
+        for found in self._paced_map(self.find_ipv6_by_hostname, addrs, asg_config.workers, asg_config.delay):
+            for v6addr, hostname, via_ipv4 in found or []:
                 result[v6addr] = (hostname, via_ipv4)
 
-            if not self.loop:  # pragma: no cover  ; not tested
-                break
-            sleep(asg_config.delay)
-
         Path("output.json").write_text(json.dumps(result), encoding="utf-8")
         return 0
 
     def terminate(self):  # pragma: no cover  ; not tested / running over multiprocessing
         """terminate scanner if running"""
-        self.loop = False
+        self._terminate()
@@ -7,19 +7,22 @@ import json
 import sys
 from pprint import pprint
 
-from sner.lib import file_from_zip
+from sner.lib import ZipReader
 from sner.server.parser import ParsedItemsDb, ParserBase
 
 
 class ParserModule(ParserBase):
     """six dns parser, pulls list of hosts for discovery module"""
 
+    VERSION = 1
+
     @staticmethod
     def parse_path(path):
         """parse data from path"""
 
         pidb = ParsedItemsDb()
-        data = json.loads(file_from_zip(path, "output.json"))
+        with ZipReader(path) as zreader:
+            data = json.loads(zreader.read("output.json"))
 
         for addr, via in data.items():
             pidb.upsert_note(addr, None, None, None, "six_dns_discover.via", data=json.dumps(via))
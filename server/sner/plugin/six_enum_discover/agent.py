@@ -17,6 +17,7 @@ class Config(ConfigBase):
 
     module: str = Literal["six_enum_discover"]
     rate: int = 100
+    workers: int = 1
 
 
 class AgentModule(ModuleBase):
@@ -37,7 +38,6 @@ class AgentModule(ModuleBase):
 
     def __init__(self):
         super().__init__()
-        self.loop = True
         self._local_networks = [
             (ip_network(f"{record.address}/{record.prefixlen}", strict=False), record.ifname)
             for record in NDB().addresses.summary()  # pylint: disable=no-member
@@ -60,22 +60,27 @@ class AgentModule(ModuleBase):
         """run the agent"""
 
         asg_config = self.init_job(assignment)
-        ret = 0
+        # rate is the budget for the whole job, split between concurrently running scanners
+        rate = max(1, asg_config.rate // max(1, asg_config.workers))
+        jobs = []
 
         for idx, target in self.enumerate_targets(assignment):
             # detect if scan has to be performed with --dst-addr or --local-scan
             first, _last = target.boundaries()
             is_localnet, iface = self._is_localnet(first)
             args = ["--local-scan", "--print-type", "global", "-i", iface] if is_localnet else ["--dst-addr", target.value]
+            jobs.append((["scan6", "--rate-limit", f"{rate}pps"] + args, f"output-{idx}.txt"))
+
+        ret = 0
+        for retval in self._execute_many(jobs, asg_config.workers):
+            ret |= retval
 
-            ret |= self._execute(["scan6", "--rate-limit", f"{asg_config.rate}pps"] + args, f"output-{idx}.txt")
-            if not self.loop:  # pragma: no cover  ; not tested
-                break
+        if self.terminating:  # pragma: no cover  ; not tested
+            ret = self.TERMINATED_RETVAL
 
         return ret
 
     def terminate(self):  # pragma: no cover  ; not tested / running over multiprocessing
         """terminate scanner if running"""
 
-        self.loop = False
         self._terminate()
@@ -6,13 +6,14 @@ parsers to import from agent outputs to storage
 import sys
 from pprint import pprint
 
-from sner.lib import files_from_zip
+from sner.lib import ZipReader
 from sner.server.parser import ParsedItemsDb, ParserBase
 
 
 class ParserModule(ParserBase):
     """six enum parser, pulls list of hosts for discovery module"""
 
+    VERSION = 1
     ARCHIVE_PATHS = r"output\-[0-9]+.txt"
 
     @classmethod
@@ -21,9 +22,10 @@ class ParserModule(ParserBase):
 
         pidb = ParsedItemsDb()
 
-        for filedata in files_from_zip(path, cls.ARCHIVE_PATHS):
-            for addr in filedata.decode("utf-8").splitlines():
-                pidb.upsert_host(addr)
+        with ZipReader(path) as zreader:
+            for stream in zreader.streams(cls.ARCHIVE_PATHS):
+                for addr in stream.read().decode("utf-8").splitlines():
+                    pidb.upsert_host(addr)
 
         return pidb
 
@@ -5,13 +5,11 @@ parsers to import from agent outputs to storage
 
 import json
 import logging
-import re
 import sys
 from collections import defaultdict
 from pprint import pprint
-from zipfile import ZipFile
 
-from sner.lib import file_from_zip
+from sner.lib import ZipReader
 from sner.plugin.nmap.parser import ParserModule as NmapParserModule
 from sner.server.parser import ParsedItemsDb, ParserBase
 
@@ -21,6 +19,7 @@ logger = logging.getLogger(__name__)
 class ParserModule(ParserBase):
     """nmap xml output parser"""
 
+    VERSION = 1
     ARCHIVE_PATHS = r"output.*\.xml|scan\-.*\.xml"
 
     @classmethod
@@ -66,13 +65,12 @@ class ParserModule(ParserBase):
         """prepare allparsed data"""
 
         allparsed = defaultdict(ParsedItemsDb)
-        with ZipFile(path) as fzip:
-            for fname in filter(lambda x: re.match(cls.ARCHIVE_PATHS, x), fzip.namelist()):
+        with ZipReader(path) as zreader:
+            for fname in zreader.names(cls.ARCHIVE_PATHS):
                 # recombine ipv4 and ipv6 scans
                 sport = fname.replace(".xml", "").split("-")[-1]
-                allparsed[sport] = NmapParserModule._parse_data(  # pylint: disable=protected-access
-                    file_from_zip(path, fname).decode("utf-8"), allparsed[sport]
-                )
+                with zreader.open(fname) as stream:
+                    allparsed[sport] = NmapParserModule._parse_stream(stream, allparsed[sport])  # pylint: disable=protected-access
 
         if "default" not in allparsed:  # pragma: no cover  ; won't test
             raise ValueError(f"missing default scan for {path}")
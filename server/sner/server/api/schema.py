@@ -21,6 +21,7 @@ class JobAssignArgsSchema(BaseSchema):
 
     queue = fields.String()
     caps = fields.List(fields.String)
+    wait = fields.Integer(validate=validate.Range(min=0))
 
 
 class JobAssignmentConfigSchema(BaseSchema):
@@ -64,6 +65,13 @@ class JobOutputSchema(BaseSchema):
     output = fields.String()
 
 
+class JobOutputStreamArgsSchema(BaseSchema):
+    """/api/v3/scheduler/job/<id>/output request args"""
+
+    retval = fields.Integer(required=True)
+    offset = fields.Integer(load_default=0, validate=validate.Range(min=0))
+
+
 class PublicNoteSchema(BaseSchema):
     """public note schema"""
 
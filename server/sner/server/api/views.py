@@ -10,7 +10,7 @@ from collections import defaultdict
 from dataclasses import dataclass
 from http import HTTPStatus
 
-from flask import Response, current_app, jsonify
+from flask import Response, current_app, jsonify, request
 from flask_login import current_user
 from flask_smorest import Blueprint, Page
 from sqlalchemy import and_, or_, select
@@ -19,7 +19,7 @@ import sner.server.api.schema as api_schema
 from sner.server.api.core import get_metrics
 from sner.server.auth.core import apikey_required
 from sner.server.extensions import db
-from sner.server.scheduler.core import SchedulerService, SchedulerServiceBusyException
+from sner.server.scheduler.core import JobManager, SchedulerService, SchedulerServiceBusyException
 from sner.server.scheduler.models import Job
 from sner.server.storage.models import Host, Note, Service, Versioninfo, Vuln
 from sner.server.storage.version_parser import is_in_version_range
@@ -50,12 +50,21 @@ def v2_scheduler_job_assign_route(args):
         return {}  # nowork
 
     try:
-        resp = SchedulerService.job_assign(args.get("queue"), args.get("caps", []))
+        if wait := min(args.get("wait", 0), current_app.config["SNER_ASSIGN_WAIT_MAX"]):
+            resp = SchedulerService.job_assign_wait(args.get("queue"), args.get("caps", []), wait)
+        else:
+            resp = SchedulerService.job_assign(args.get("queue"), args.get("caps", []))
     except SchedulerServiceBusyException:
         resp = {}  # nowork
     return resp
 
 
+def _running_job(job_id):
+    """get running job by id"""
+
+    return Job.query.filter(Job.id == job_id, Job.retval == None).one_or_none()  # noqa: E711  pylint: disable=singleton-comparison
+
+
 @blueprint.route("/v2/scheduler/job/output", methods=["POST"])
 @apikey_required("agent")
 @blueprint.arguments(api_schema.JobOutputSchema)
@@ -67,20 +76,74 @@ def v2_scheduler_job_output_route(args):
     except binascii.Error:
         return jsonify({"message": "invalid request"}), HTTPStatus.BAD_REQUEST
 
-    job = Job.query.filter(Job.id == args["id"], Job.retval == None).one_or_none()  # noqa: E711  pylint: disable=singleton-comparison
-    if not job:
+    if not (job := _running_job(args["id"])):
         # invalid/repeated requests are silently discarded, agent would delete working data
         # on it's side as well
         return jsonify({"message": "discard job"})
 
     try:
-        SchedulerService.job_output(job, args["retval"], output)
+        if not SchedulerService.job_output(job, args["retval"], output):
+            # job finished by concurrent repeated request
+            return jsonify({"message": "discard job"})
     except SchedulerServiceBusyException:
         return jsonify({"message": "server busy"}), HTTPStatus.TOO_MANY_REQUESTS
 
     return jsonify({"message": "success"})
 
 
+@blueprint.route("/v3/scheduler/job/<job_id>/output", methods=["GET"])
+@apikey_required("agent")
+def v3_scheduler_job_output_offset_route(job_id):
+    """get length of partially uploaded output, allows agent to resume interrupted upload"""
+
+    if not (job := _running_job(job_id)):
+        return jsonify({"message": "discard job"})
+    return jsonify({"offset": JobManager.output_offset(job)})
+
+
+def _stream_job_output(job, args):
+    """receive streamed job output; job lock must be held"""
+
+    # job might have been finished by concurrent repeated request while waiting for the lock
+    db.session.refresh(job)
+    if job.retval is not None:
+        return jsonify({"message": "discard job"})
+
+    try:
+        JobManager.write_output_stream(job, request.stream, args["offset"])
+    except ValueError:
+        return jsonify({"message": "invalid offset", "offset": JobManager.output_offset(job)}), HTTPStatus.CONFLICT
+
+    if not SchedulerService.job_output(job, args["retval"]):
+        # job finished by concurrent repeated request
+        return jsonify({"message": "discard job"})
+    return jsonify({"message": "success"})
+
+
+@blueprint.route("/v3/scheduler/job/<job_id>/output", methods=["POST"])
+@apikey_required("agent")
+@blueprint.arguments(api_schema.JobOutputStreamArgsSchema, location="query")
+def v3_scheduler_job_output_route(args, job_id):
+    """
+    receive output from assigned job, raw output is streamed in request body starting from offset.
+    repeated requests for the same job are serialized by job lock, partial output file is shared.
+    """
+
+    if not (job := _running_job(job_id)):
+        # invalid/repeated requests are silently discarded, agent would delete working data
+        # on it's side as well
+        return jsonify({"message": "discard job"})
+
+    try:
+        SchedulerService.get_job_lock(job_id, SchedulerService.TIMEOUT_JOB_OUTPUT)
+        try:
+            return _stream_job_output(job, args)
+        finally:
+            SchedulerService.release_job_lock(job_id)
+    except SchedulerServiceBusyException:
+        return jsonify({"message": "server busy"}), HTTPStatus.TOO_MANY_REQUESTS
+
+
 @blueprint.route("/v2/metrics")
 @blueprint.response(HTTPStatus.OK, {"type": "string"}, content_type="text/plain")
 def v2_stats_prometheus_route():
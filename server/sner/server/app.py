@@ -70,9 +70,18 @@ DEFAULT_CONFIG = {
     # sner server scheduler
     "SNER_MAINTENANCE": False,
     "SNER_HEATMAP_HOT_LEVEL": 0,
+    # long-polling assignment holds web worker and database connection per waiting agent,
+    # enable only with threaded or async workers sized for the number of agents
+    "SNER_ASSIGN_WAIT_MAX": 0,
+    # maximum concurrent long-polling assignments per process, each holds dedicated database connection
+    "SNER_ASSIGN_WAITERS_MAX": 4,
+    "SNER_PREFETCH_SIZE": 0,
+    "SNER_PREFETCH_TTL": 300,
     "SNER_EXCLUSIONS": [["regex", r"^.*,proto=tcp,port=22,.*$"], ["network", "127.66.66.0/26"]],
     # other sner subsystems
     "SNER_PLANNER": {},
+    "SNER_PLANNER_PARSE_WORKERS": 1,
+    "SNER_PARSED_CACHE_MAX_SIZE": 1024**3,
     "SNER_METRICS_STALE_HORIZONT": "1day",
     "SNER_AGREEGATE_USE_NETLISTS": True,
     "SNER_AGREEGATE_URL": None,
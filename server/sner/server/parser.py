@@ -7,17 +7,22 @@ tools. Parsers should be implemented via sner.plugin package and must
 implement ParserBase interface.
 """
 
+import os
+import pickle
 from abc import ABC, abstractmethod
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
+from hashlib import sha256
 from importlib import import_module
 from pathlib import Path
+from uuid import uuid4
 
 from littletable import Table as LittleTable
 
 import sner.plugin
 from sner.targets import TargetManager
+from sner.version import __version__
 
 REGISTERED_PARSERS = {}
 
@@ -155,18 +160,32 @@ class ParsedItemsDb:
         self.notes = ParsedItemsTable()
         self.notes.create_index("iid", unique=True)
         self.targets = ParsedItemsTable()
-        self._autoiids = defaultdict(lambda: -1)
-
-    @staticmethod
-    def _first(alist):
-        if alist:
-            return alist[0]
-        return None
+        # plain defaultdict keeps pidb picklable for parsing in worker processes
+        self._autoiids = defaultdict(int)
+        # upsert composite key indexes, {table_name: {key: item}}
+        self._upsert_index = defaultdict(dict)
 
     def _next_iid(self, table_name):
         """get next auto-id"""
+        iid = self._autoiids[table_name]
         self._autoiids[table_name] += 1
-        return self._autoiids[table_name]
+        return iid
+
+    def _upsert_lookup(self, table_name, key):
+        """lookup item by upsert key; items might have been removed from table directly (eg. planner filters)"""
+
+        item = self._upsert_index[table_name].get(key)
+        if item and (item.iid in getattr(self, table_name).by.iid):
+            return item
+        return None
+
+    def _upsert_insert(self, table_name, key, item):
+        """insert new item and index it by upsert key"""
+
+        item.iid = self._next_iid(table_name)
+        getattr(self, table_name).insert(item)
+        self._upsert_index[table_name][key] = item
+        return item
 
     def insert_target(self, target):
         """insert target"""
@@ -179,14 +198,13 @@ class ParsedItemsDb:
 
         host = ParsedHost(address, **kwargs)
 
-        pidb_host = self._first(self.hosts.where(address=host.address))
+        key = (host.address,)
+        pidb_host = self._upsert_lookup("hosts", key)
         if pidb_host:
             pidb_host.update(host)
             return pidb_host
 
-        host.iid = self._next_iid("hosts")
-        self.hosts.insert(host)
-        return host
+        return self._upsert_insert("hosts", key, host)
 
     def upsert_service(self, host_address, proto, port, **kwargs):
         """upsert service"""
@@ -194,14 +212,13 @@ class ParsedItemsDb:
         pidb_host = self.upsert_host(host_address)
         service = ParsedService(pidb_host.iid, proto, port, **kwargs)
 
-        pidb_service = self._first(self.services.where(host_iid=service.host_iid, proto=service.proto, port=service.port))
+        key = (service.host_iid, service.proto, service.port)
+        pidb_service = self._upsert_lookup("services", key)
         if pidb_service:
             pidb_service.update(service)
             return pidb_service
 
-        service.iid = self._next_iid("services")
-        self.services.insert(service)
-        return service
+        return self._upsert_insert("services", key, service)
 
     def upsert_vuln(self, host_address, service_proto, service_port, via_target, xtype, name, **kwargs):
         """upsert vuln"""
@@ -217,22 +234,13 @@ class ParsedItemsDb:
             **kwargs,
         )
 
-        pidb_vuln = self._first(
-            self.vulns.where(
-                host_iid=vuln.host_iid,
-                name=vuln.name,
-                xtype=vuln.xtype,
-                service_iid=vuln.service_iid,
-                via_target=vuln.via_target,
-            )
-        )
+        key = (vuln.host_iid, vuln.name, vuln.xtype, vuln.service_iid, vuln.via_target)
+        pidb_vuln = self._upsert_lookup("vulns", key)
         if pidb_vuln:
             pidb_vuln.update(vuln)
             return pidb_vuln
 
-        vuln.iid = self._next_iid("vulns")
-        self.vulns.insert(vuln)
-        return vuln
+        return self._upsert_insert("vulns", key, vuln)
 
     def upsert_note(self, host_address, service_proto, service_port, via_target, xtype, **kwargs):
         """upsert vuln"""
@@ -247,14 +255,13 @@ class ParsedItemsDb:
             **kwargs,
         )
 
-        pidb_note = self._first(self.notes.where(host_iid=note.host_iid, xtype=note.xtype, service_iid=note.service_iid, via_target=note.via_target))
+        key = (note.host_iid, note.xtype, note.service_iid, note.via_target)
+        pidb_note = self._upsert_lookup("notes", key)
         if pidb_note:
             pidb_note.update(note)
             return pidb_note
 
-        note.iid = self._next_iid("notes")
-        self.notes.insert(note)
-        return note
+        return self._upsert_insert("notes", key, note)
 
     def ident(self, pidb_item):
         """
@@ -274,7 +281,12 @@ class ParsedItemsDb:
 
 
 class ParserBase(ABC):
-    """parser interface definition"""
+    """
+    parser interface definition
+
+    parser implementations must define VERSION (int) and bump it whenever parsed output changes,
+    including changes in shared code used by the parser. version is part of parsed cache key.
+    """
 
     @staticmethod
     @abstractmethod
@@ -286,3 +298,96 @@ class ParserBase(ABC):
         :return: pseudo database of parsed objects (hosts, services, vulns, notes)
         :rtype: ParsedItemsDb
         """
+
+
+def parser_version(parser_impl):
+    """parser version; derived from sner version and versions of parser implementation and its parser bases"""
+
+    versions = [str(klass.__dict__["VERSION"]) for klass in parser_impl.__mro__ if "VERSION" in klass.__dict__]
+    return ":".join([__version__, *versions])
+
+
+class ParsedCache:
+    """
+    content-addressed cache of parsed items databases, keyed by parser name, parser version and
+    parsed file content hash. least recently used entries are evicted when cache grows over max_size,
+    eviction is expensive (scans whole cache) and is up to caller to run it once after batch of puts
+    """
+
+    CHUNK_SIZE = 1024**2
+
+    def __init__(self, path, max_size):
+        self.path = Path(path)
+        self.max_size = max_size
+
+    @classmethod
+    def file_hash(cls, path):
+        """hash file content"""
+
+        digest = sha256()
+        with open(path, "rb") as ftmp:
+            while chunk := ftmp.read(cls.CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key(self, parser, path):
+        """cache key for parser and file"""
+        return sha256(f"{parser}:{parser_version(REGISTERED_PARSERS[parser])}:{self.file_hash(path)}".encode()).hexdigest()
+
+    def get(self, key):
+        """get cached pidb or None, access time is tracked as mtime"""
+
+        entry = self.path / f"{key}.pickle"
+        try:
+            pidb = pickle.loads(entry.read_bytes())
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+            # truncated or stale entry, eg. pickled classes changed meanwhile
+            entry.unlink(missing_ok=True)
+            return None
+        return pidb
+
+    def put(self, key, pidb):
+        """store pidb"""
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmpentry = self.path / f".{key}.{uuid4()}"
+        tmpentry.write_bytes(pickle.dumps(pidb))
+        tmpentry.rename(self.path / f"{key}.pickle")
+
+    def parse(self, parser, path):
+        """parse path with cache"""
+
+        key = self.key(parser, path)
+        if (pidb := self.get(key)) is not None:
+            return pidb
+
+        pidb = REGISTERED_PARSERS[parser].parse_path(path)
+        self.put(key, pidb)
+        return pidb
+
+    def entries(self):
+        """list cache entries, least recently used first"""
+
+        if not self.path.exists():
+            return []
+        return sorted(((entry.stat(), entry) for entry in self.path.glob("*.pickle")), key=lambda item: item[0].st_mtime)
+
+    def evict(self, max_size=None):
+        """evict least recently used entries until total size fits max_size (cache max_size by default), returns number of evicted entries"""
+
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = self.entries()
+        total = sum(stat.st_size for stat, _ in entries)
+        evicted = 0
+        for stat, entry in entries:
+            if total <= max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total -= stat.st_size
+            evicted += 1
+        return evicted
@@ -5,24 +5,26 @@ planner stages
 
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 from ipaddress import IPv6Address, ip_address, ip_network
+from multiprocessing import get_context
 from pathlib import Path
 
 from flask import current_app
 from littletable import Table
 from pytimeparse import parse as timeparse
-from sqlalchemy import select
 from sqlalchemy.orm.exc import NoResultFound
 
 from sner.server.extensions import db
-from sner.server.scheduler.core import JobManager, QueueManager, enumerate_network
-from sner.server.scheduler.models import Job, Queue, Target
+from sner.server.scheduler.core import JobManager, QueueManager
+from sner.server.scheduler.models import Job, Queue
 from sner.server.storage.core import StorageManager
 from sner.server.storage.models import Host, Note, Vuln
 from sner.server.storage.versioninfo import VersioninfoManager
-from sner.targets import HostTarget, ServiceTarget, SixenumTarget, TargetManager
+from sner.targets import HostTarget, RangeTarget, ServiceTarget, SixenumTarget
 
 TARPIT_THRESHOLD = 200
 
@@ -78,30 +80,51 @@ class QueueHandler(Stage):
             raise ValueError(f'queue "{queue_name}" does not exist') from None
 
     def _drain(self):
-        """drain queue and yield PIDBs"""
-
-        for aajob in Job.query.filter(Job.queue_id == self.queue.id, Job.retval == 0).all():
-            current_app.logger.info(f"{self.name} drain {aajob.id} ({aajob.queue.name})")
-            try:
-                parsed = JobManager.parse(aajob)
-            except Exception as exc:  # pylint: disable=broad-except
-                current_app.logger.error(f"{self.__class__.__name__} failed to drain {aajob.id} ({aajob.queue.name}), {exc}", exc_info=True)
-                aajob.retval += 1000
-                db.session.commit()
-                continue
-            yield parsed
-            JobManager.archive(aajob)
-            JobManager.delete(aajob)
+        """
+        drain queue and yield PIDBs in jobs order. with SNER_PLANNER_PARSE_WORKERS > 1, up to
+        that many following jobs are parsed ahead in process pool while current one is being imported.
+        if the pool breaks (eg. worker killed), remaining jobs are parsed in-process.
+        """
 
-    def task(self, targets):
-        """enqueue targetsV2 into queue"""
+        jobs = Job.query.filter(Job.queue_id == self.queue.id, Job.retval == 0).all()
+        workers = min(current_app.config["SNER_PLANNER_PARSE_WORKERS"], len(jobs))
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) if workers > 1 else None
+        futures = {}
 
-        query = db.session.connection().execute(select(Target.target).filter(Target.queue == self.queue)).scalars()
-        already_queued = TargetManager.from_list(query.all())
+        try:
+            for idx, aajob in enumerate(jobs):
+                if executor:
+                    for ahead in jobs[idx:][:workers]:
+                        if ahead.id not in futures:
+                            futures[ahead.id] = executor.submit(JobManager.parse_output, ahead.queue.config, ahead.output_abspath, ahead.assignment)
+
+                current_app.logger.info(f"{self.name} drain {aajob.id} ({aajob.queue.name})")
+                try:
+                    try:
+                        parsed = futures.pop(aajob.id).result() if executor else JobManager.parse(aajob)
+                    except BrokenProcessPool:
+                        current_app.logger.warning(f"{self.__class__.__name__} parse pool broken, parsing remaining jobs in-process")
+                        executor.shutdown(cancel_futures=True)
+                        executor = None
+                        futures = {}
+                        parsed = JobManager.parse(aajob)
+                except Exception as exc:  # pylint: disable=broad-except
+                    current_app.logger.error(f"{self.__class__.__name__} failed to drain {aajob.id} ({aajob.queue.name}), {exc}", exc_info=True)
+                    aajob.retval += 1000
+                    db.session.commit()
+                    continue
+                yield parsed
+                JobManager.archive(aajob)
+                JobManager.delete(aajob)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def task(self, targets):
+        """enqueue targetsV2 into queue, targets already queued are skipped by database"""
 
-        enqueue = list(set(targets) - set(already_queued))
-        QueueManager.enqueue(self.queue, enqueue)
-        current_app.logger.info(f'{self.name} enqueued {len(enqueue)} targets to "{self.queue.name}"')
+        count = QueueManager.enqueue(self.queue, targets, dedupe=True)
+        current_app.logger.info(f'{self.name} enqueued {count} targets to "{self.queue.name}"')
 
 
 class DummyStage(Stage):
@@ -135,7 +158,7 @@ class StorageLoader(QueueHandler):
 
 
 class Netlist(Schedule):
-    """periodic host discovery via list of ipv4 networks"""
+    """periodic host discovery via list of ipv4 networks, networks are tasked as compact ranges"""
 
     def __init__(self, name, schedule, netlist, next_stages):
         super().__init__(name, schedule)
@@ -145,12 +168,12 @@ class Netlist(Schedule):
     def _run(self):
         """run"""
 
-        hosts = []
+        ranges = []
         for net in self.netlist:
-            hosts += [HostTarget(item) for item in enumerate_network(net)]
-        current_app.logger.info(f"{self.name} enumerated {len(hosts)} hosts")
+            ranges += RangeTarget.from_network(net)
+        current_app.logger.info(f"{self.name} enumerated {sum(item.size() for item in ranges)} hosts in {len(ranges)} ranges")
         for stage in self.next_stages:
-            stage.task(hosts)
+            stage.task(ranges)
 
 
 class ServiceDiscoStorageLoader(QueueHandler):
@@ -6,11 +6,14 @@ scheduler commands
 import logging
 import sys
 from ipaddress import ip_address, summarize_address_range
+from itertools import chain
+from time import perf_counter, sleep
 
 import click
+from flask import current_app
 from flask.cli import with_appcontext
 
-from sner.server.scheduler.core import QueueManager, SchedulerService, enumerate_network
+from sner.server.scheduler.core import QueueManager, SchedulerService, SchedulerServiceBusyException, enumerate_network
 from sner.server.scheduler.models import Queue
 from sner.targets import TargetManager
 
@@ -66,14 +69,14 @@ def queue_enqueue_command(queue_name, targets, **kwargs):
     if not (queue := _queue_by_name(queue_name)):
         sys.exit(1)
 
-    targets = list(targets)
+    # sources are streamed line by line into the queue
+    sources = [targets]
     if kwargs["file"]:
-        targets.extend(kwargs["file"].read().splitlines())
-    if not targets:
-        targets.extend(sys.stdin.readlines())
-    targets = list(filter(None, map(str.strip, targets)))
+        sources.append(kwargs["file"])
+    if not (targets or kwargs["file"]):
+        sources.append(sys.stdin)
 
-    QueueManager.enqueue(queue, TargetManager.from_list(targets))
+    QueueManager.enqueue(queue, map(TargetManager.from_str, filter(None, map(str.strip, chain.from_iterable(sources)))))
 
 
 @command.command(name="queue-flush", help="flush all targets from queue")
@@ -103,7 +106,30 @@ def queue_prune_command(queue_name):
 def readynet_recount_command():
     """refresh readynets for current heatmap_hot_level"""
 
-    SchedulerService.readynet_recount()
+    time_start = perf_counter()
+    count = SchedulerService.readynet_recount()
+    print(f"readynet recount, {count} readynets added in {perf_counter() - time_start:.3f}s")
+
+
+@command.command(name="prefetch", help="run assignment prefetch filler daemon")
+@click.option("--size", type=int, help="prefetched assignments per queue, defaults to SNER_PREFETCH_SIZE")
+@click.option("--interval", type=float, default=1.0, help="fill interval in seconds")
+@click.option("--oneshot", is_flag=True)
+@with_appcontext
+def prefetch_command(**kwargs):
+    """keep prefetch buffers filled, reclaim expired prefetched assignments"""
+
+    size = current_app.config["SNER_PREFETCH_SIZE"] if kwargs["size"] is None else kwargs["size"]
+    while True:
+        try:
+            reclaimed = SchedulerService.prefetch_reclaim(current_app.config["SNER_PREFETCH_TTL"])
+            filled = SchedulerService.prefetch_fill(size)
+            print(f"prefetch, {filled} assignments prefetched, {reclaimed} reclaimed")
+        except SchedulerServiceBusyException:  # pragma: no cover  ; won't test
+            pass
+        if kwargs["oneshot"]:
+            break
+        sleep(kwargs["interval"])  # pragma: no cover  ; won't test
 
 
 @command.command(name="heatmap-check", help="check heatmap if corresponds with running jobs")
@@ -2,40 +2,62 @@
 """
 scheduler shared functions
 """
+# pylint: disable=too-many-lines
 
 import json
 import re
 from abc import ABC, abstractmethod
-from collections import defaultdict, namedtuple
-from datetime import datetime
+from bisect import bisect_right
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime, timedelta
 from enum import Enum
+from functools import lru_cache
 from ipaddress import ip_address, ip_network
+from itertools import chain
 from pathlib import Path
 from random import random
-from shutil import copy2
+from select import select as select_fds
+from shutil import copy2, copyfileobj
+from tempfile import mkstemp
+from threading import Lock
+from time import monotonic
 from uuid import uuid4
 
 import yaml
 from flask import current_app
-from sqlalchemy import and_, cast, delete, distinct, func, or_, select, text
+from sqlalchemy import Column, MetaData, Table, and_, cast, delete, distinct, func, literal, or_, select, text
 from sqlalchemy.dialects.postgresql import ARRAY as pg_ARRAY
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
 
 from sner.server.extensions import db
-from sner.server.parser import REGISTERED_PARSERS
-from sner.server.scheduler.models import Heatmap, Job, Queue, Readynet, Target
+from sner.server.parser import REGISTERED_PARSERS, load_parser_plugins
+from sner.server.scheduler.models import Heatmap, Job, Prefetch, Queue, Readynet, Target
 from sner.targets import (
     AurorTestsslTarget,
     GenericTarget,
     HostTarget,
     NamedServiceTarget,
+    RangeTarget,
     ServiceTarget,
     SixenumTarget,
     TargetManager,
 )
 
 SCHEDULER_LOCK_NUMBER = 1
+SCHEDULER_QUEUE_LOCK_NAMESPACE = 2
+SCHEDULER_JOB_LOCK_NAMESPACE = 3
+SCHEDULER_NOTIFY_CHANNEL = "sner_scheduler"
+
+# per-transaction staging table used by bulk enqueue, lives outside of the application models metadata
+TargetStaging = Table(
+    "target_staging",
+    MetaData(),
+    Column("target", db.Text, nullable=False),
+    Column("hashval", db.Text, nullable=False),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
 
 
 def enumerate_network(arg):
@@ -67,7 +89,12 @@ class ExclFamily(Enum):
 
 
 class ExclMatcher:
-    """object matching value againts set of exclusions/rules"""
+    """
+    object matching value againts set of exclusions/rules
+
+    exclusions are grouped by family and compiled into single matcher per family,
+    use from_config to get instance cached until the config changes.
+    """
 
     MATCHERS = {}
 
@@ -83,19 +110,42 @@ class ExclMatcher:
         return register_real
 
     def __init__(self, config):
-        self.excls = [ExclMatcher.MATCHERS[ExclFamily(family)](value) for family, value in config]
+        grouped = defaultdict(list)
+        for family, value in config:
+            grouped[ExclFamily(family)].append(value)
+        self.excls = [ExclMatcher.MATCHERS[family](values) for family, values in grouped.items()]
+
+    @classmethod
+    def from_config(cls, config):
+        """return compiled matcher for config, instances are cached by config value"""
+        return cls._from_config_cached(tuple(tuple(item) for item in config))
+
+    @classmethod
+    @lru_cache(maxsize=8)
+    def _from_config_cached(cls, config):
+        return cls(config)
+
+    def _match(self, target, targetstr):
+        return any(excl.match(target, targetstr) for excl in self.excls)
 
     def match(self, targetstr):
         """match value against all exclusions/matchers"""
-        # matcher is called only from SchedulerService with
-        # raw value from storage, it's parsed and both raw and parsed
-        # values are passed to matcher implementation so it is not necessary
-        # to recompute values for each instance call
-        target = TargetManager.from_str(targetstr)
-        for excl in self.excls:
-            if excl.match(target, targetstr):
-                return True
-        return False
+        # raw value from storage is parsed and both raw and parsed values are
+        # passed to matcher implementation so it is not necessary to recompute
+        # values for each instance call
+        return self._match(TargetManager.from_str(targetstr), targetstr)
+
+    def filter(self, targets):
+        """yield targets not matching any exclusion, ranges are trimmed to non-excluded subranges"""
+
+        for target in targets:
+            if isinstance(target, RangeTarget):
+                pieces = [target]
+                for excl in self.excls:
+                    pieces = [trimmed for piece in pieces for trimmed in excl.trim(piece)]
+                yield from pieces
+            elif not self._match(target, str(target)):
+                yield target
 
 
 class ExclMatcherImplBase(ABC):
@@ -103,12 +153,16 @@ class ExclMatcherImplBase(ABC):
 
     @abstractmethod
     def __init__(self, match_to):
-        """initialize matcher"""
+        """initialize matcher with list of family values"""
         self.match_to = match_to  # pragma: nocover  ; implementation shadows the statement
 
     @abstractmethod
     def match(self, target, targetstr):
-        """returns bool if value matches the initialized match_to"""
+        """returns bool if value matches any of the initialized match_to"""
+
+    def trim(self, target):
+        """return list of range target pieces not matching the matcher"""
+        return [target]
 
     def __repr__(self):
         return f"<{self.__class__.__name__} {self.match_to}>"
@@ -116,16 +170,35 @@ class ExclMatcherImplBase(ABC):
 
 @ExclMatcher.register(ExclFamily.NETWORK)
 class NetworkExclMatcher(ExclMatcherImplBase):
-    """network matcher"""
+    """network matcher, networks are compiled into sorted merged intervals per ip version"""
 
     def __init__(self, match_to):
-        self.match_to = ip_network(match_to)
+        self.match_to = [ip_network(item) for item in match_to]
+
+        self.intervals = {}
+        for version in (4, 6):
+            merged = []
+            for network in sorted((item for item in self.match_to if item.version == version), key=lambda x: int(x.network_address)):
+                first, last = int(network.network_address), int(network.broadcast_address)
+                if merged and first <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], last)
+                else:
+                    merged.append([first, last])
+            self.intervals[version] = ([item[0] for item in merged], [item[1] for item in merged])
+
+    def _test_interval(self, first, last):
+        """test if address interval overlaps any excluded interval"""
+
+        starts, ends = self.intervals[first.version]
+        idx = bisect_right(starts, int(last)) - 1
+        return (idx >= 0) and (ends[idx] >= int(first))
 
     def _test_addr(self, value):
         try:
-            return ip_address(value) in self.match_to
+            addr = ip_address(value)
         except ValueError:
             return False
+        return self._test_interval(addr, addr)
 
     def match(self, target, _targetstr):
         if isinstance(target, GenericTarget):
@@ -135,71 +208,171 @@ class NetworkExclMatcher(ExclMatcherImplBase):
             return self._test_addr(target.address)
 
         if isinstance(target, SixenumTarget):
-            first, last = target.boundaries()
+            # excluded range could be smaller than enum, any overlap excludes the enum
+            return self._test_interval(*target.boundaries())
+
+        if isinstance(target, RangeTarget):
+            return self._test_interval(ip_address(target.first), ip_address(target.last))
 
-            # first or last enum addr is in excluded range
-            if self._test_addr(first) or self._test_addr(last):
-                return True
+        return False  # pragma: nocover  ; all target types handled
 
-            # excluded range could be smaller than enum, check if excluded range does not belong into enum itself
-            if (first.version == self.match_to.version) and (
-                (first <= self.match_to.network_address <= last) or (first <= self.match_to.broadcast_address <= last)
-            ):
-                return True
+    def trim(self, target):
+        first, last = ip_address(target.first), ip_address(target.last)
+        starts, ends = self.intervals[first.version]
+        addr_class = first.__class__
 
-        return False
+        pieces = []
+        cursor = int(first)
+        # iterate excluded intervals from the first one not ending before range
+        for idx in range(bisect_right(ends, int(first) - 1), len(starts)):
+            if starts[idx] > int(last):
+                break
+            if starts[idx] > cursor:
+                pieces.append(RangeTarget(str(addr_class(cursor)), str(addr_class(starts[idx] - 1))))
+            cursor = max(cursor, ends[idx] + 1)
+        if cursor <= int(last):
+            pieces.append(RangeTarget(str(addr_class(cursor)), target.last))
+        return pieces
 
 
 @ExclMatcher.register(ExclFamily.REGEX)
 class RegexExclMatcher(ExclMatcherImplBase):
-    """regex matcher"""
+    """regex matcher, patterns without capture groups are compiled into single alternation"""
 
     def __init__(self, match_to):
-        self.match_to = re.compile(match_to)
+        self.match_to = match_to
+        compiled = [re.compile(item) for item in match_to]
+
+        # combining would renumber capture groups and break backreferences, such patterns are matched one by one
+        self.regexes = [regex for regex in compiled if regex.groups]
+        if combinable := [regex.pattern for regex in compiled if not regex.groups]:
+            try:
+                self.regexes.append(re.compile("|".join(f"(?:{item})" for item in combinable)))
+            except re.error:
+                # patterns which cannot be combined (eg. global flags) are matched one by one
+                self.regexes += [regex for regex in compiled if not regex.groups]
 
     def match(self, _target, targetstr):
-        return bool(self.match_to.search(targetstr))
+        return any(regex.search(targetstr) for regex in self.regexes)
+
+
+class CopyStream:
+    """file-like object streaming rows of text values in postgresql COPY text format"""
+
+    ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = b""
+
+    def read(self, size=-1):
+        """read up to size bytes, rows are serialized on demand"""
+
+        chunks = [self.buffer]
+        length = len(self.buffer)
+        while (size < 0) or (length < size):
+            if (row := next(self.rows, None)) is None:
+                break
+            line = ("\t".join(value.translate(self.ESCAPES) for value in row) + "\n").encode()
+            chunks.append(line)
+            length += len(line)
+
+        data = b"".join(chunks)
+        if size < 0:
+            size = len(data)
+        self.buffer = data[size:]
+        return data[:size]
 
 
 class QueueManager:
     """Governs queues, readynets and targets"""
 
     @staticmethod
-    def enqueue(queue, targets):
-        """enqueue targets to queue"""
+    def enqueue(queue, targets, dedupe=False):
+        """
+        enqueue targets to queue
 
-        enqueued = []
-        enqueued_hashvals = set()
+        targets are consumed lazily and streamed via COPY into temporary staging table,
+        readynets are derived from staged hashvals with single set-based statement.
+        excluded targets are dropped (ranges trimmed) before they reach the queue.
 
-        for target in targets:
-            thashval = target.hashval()
-            enqueued.append({"queue_id": queue.id, "target": str(target), "hashval": thashval})
-            enqueued_hashvals.add(thashval)
-
-        if enqueued:
-            SchedulerService.get_lock()
-
-            conn = db.session.connection()
-            conn.execute(pg_insert(Target), enqueued)
-            hot_hashvals = set(SchedulerService.grep_hot_hashvals(enqueued_hashvals))
-            for thashval in enqueued_hashvals - hot_hashvals:
-                conn.execute(pg_insert(Readynet).values(queue_id=queue.id, hashval=thashval).on_conflict_do_nothing(constraint="readynet_pkey"))
-            db.session.commit()
+        :param dedupe: skip targets already present in queue (and duplicates within targets),
+                       evaluated by database anti-join
+        :return: number of enqueued targets
+        :rtype: int
+        """
+
+        targets = ExclMatcher.from_config(current_app.config["SNER_EXCLUSIONS"]).filter(targets)
+        if (first := next(targets, None)) is None:
+            return 0
 
-            SchedulerService.release_lock()
+        SchedulerService.get_queue_lock(queue.id)
+
+        conn = db.session.connection()
+        TargetStaging.create(conn)
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY target_staging (target, hashval) FROM STDIN",
+                CopyStream((str(target), target.hashval()) for target in chain([first], targets)),
+            )
+        staged = select(literal(queue.id, db.Integer), TargetStaging.c.target, TargetStaging.c.hashval)
+        if dedupe:
+            # hashval is part of the condition to hit target_queueid_hashval index. range is considered
+            # duplicate if any (partially sliced) range for same hashval network is still pending in queue
+            staged = staged.distinct().filter(
+                ~select(Target.id)
+                .filter(
+                    Target.queue_id == queue.id,
+                    Target.hashval == TargetStaging.c.hashval,
+                    or_(
+                        Target.target == TargetStaging.c.target,
+                        and_(Target.target.startswith("range,"), TargetStaging.c.target.startswith("range,")),
+                    ),
+                )
+                .exists()
+            )
+        count = conn.execute(pg_insert(Target).from_select(["queue_id", "target", "hashval"], staged)).rowcount
+
+        # readynets reflect heatmap state, only the transition is guarded by shared lock
+        SchedulerService.get_lock()
+        candidates = select(literal(queue.id, db.Integer), TargetStaging.c.hashval).distinct()
+        if current_app.config["SNER_HEATMAP_HOT_LEVEL"]:
+            candidates = candidates.filter(
+                TargetStaging.c.hashval.not_in(select(Heatmap.hashval).filter(Heatmap.count >= current_app.config["SNER_HEATMAP_HOT_LEVEL"]))
+            )
+        conn.execute(pg_insert(Readynet).from_select(["queue_id", "hashval"], candidates).on_conflict_do_nothing(constraint="readynet_pkey"))
+        if count:
+            SchedulerService.notify_work()
+        db.session.commit()
+        SchedulerService.release_lock()
+
+        SchedulerService.release_queue_lock(queue.id)
+        return count
 
     @staticmethod
     def flush(queue):
         """queue flush; flush all targets from queue"""
 
-        SchedulerService.get_lock()
+        SchedulerService.get_queue_lock(queue.id)
 
         Target.query.filter(Target.queue_id == queue.id).delete()
-        Readynet.query.filter(Readynet.queue_id == queue.id).delete()
         db.session.commit()
 
+        SchedulerService.get_lock()
+        Readynet.query.filter(Readynet.queue_id == queue.id).delete()
+        QueueManager._drop_prefetches(queue.id)
+        db.session.commit()
         SchedulerService.release_lock()
 
+        SchedulerService.release_queue_lock(queue.id)
+
+    @staticmethod
+    def _drop_prefetches(queue_id):
+        """drop prefetched assignments of the queue and release their heatmap counts; shared lock must be held"""
+
+        targets = db.session.execute(delete(Prefetch).filter(Prefetch.queue_id == queue_id).returning(Prefetch.targets)).scalars().all()
+        SchedulerService.heatmap_pop_many(map(SchedulerService.hashval, chain.from_iterable(map(json.loads, targets))))
+
     @staticmethod
     def prune(queue):
         """queue prune; delete all queue jobs"""
@@ -221,15 +394,21 @@ class QueueManager:
         except OSError as exc:  # pragma: no cover  ; wont test
             raise RuntimeError(f"failed to remove queue directory: {exc.strerror}") from None
 
+        queue_id = queue.id
+        SchedulerService.get_queue_lock(queue_id)
         SchedulerService.get_lock()
+        QueueManager._drop_prefetches(queue_id)
         db.session.delete(queue)
         db.session.commit()
         SchedulerService.release_lock()
+        SchedulerService.release_queue_lock(queue_id)
 
 
 class JobManager:
     """job governance"""
 
+    OUTPUT_CHUNK_SIZE = 1024 * 1024
+
     @staticmethod
     def create(queue, assigned_targets):
         """
@@ -245,12 +424,54 @@ class JobManager:
         return assignment
 
     @staticmethod
-    def finish(job, retval, output):
-        """writeback job results"""
+    def write_output(job, output):
+        """
+        write job output data into request private staging file
+
+        :return: staging file path
+        :rtype: str
+        """
+
+        Path(job.output_abspath).parent.mkdir(parents=True, exist_ok=True)
+        fd, staged = mkstemp(dir=Path(job.output_abspath).parent, prefix=f".{job.id}.")
+        with open(fd, "wb") as output_file:
+            output_file.write(output)
+        return staged
+
+    @staticmethod
+    def output_offset(job):
+        """length of partially uploaded job output"""
+
+        ppath = Path(job.output_partpath)
+        return ppath.stat().st_size if ppath.exists() else 0
+
+    @staticmethod
+    def write_output_stream(job, stream, offset=0):
+        """
+        write streamed job output chunk by chunk into partial output file from offset.
+        partial file is kept on interrupted upload, so the upload can be resumed. partial file
+        is shared by all requests for the job, job lock must be held.
+
+        :return: length of partial output
+        :rtype: int
+        """
+
+        if offset > JobManager.output_offset(job):
+            raise ValueError("offset beyond partial output")
+
+        ppath = Path(job.output_partpath)
+        ppath.parent.mkdir(parents=True, exist_ok=True)
+        with open(ppath, "r+b" if ppath.exists() else "wb") as output_file:
+            output_file.seek(offset)
+            output_file.truncate()
+            copyfileobj(stream, output_file, JobManager.OUTPUT_CHUNK_SIZE)
+            return output_file.tell()
+
+    @staticmethod
+    def finish(job, retval, staged):
+        """writeback job results, output is moved from staging file"""
 
-        opath = Path(job.output_abspath)
-        opath.parent.mkdir(parents=True, exist_ok=True)
-        opath.write_bytes(output)
+        Path(staged).replace(job.output_abspath)
         job.retval = retval
         job.time_end = datetime.utcnow()
         db.session.commit()
@@ -269,8 +490,7 @@ class JobManager:
         SchedulerService.get_lock()
 
         job.retval = -1
-        for target in json.loads(job.assignment)["targets"]:
-            SchedulerService.heatmap_pop(SchedulerService.hashval(target))
+        SchedulerService.heatmap_pop_many(map(SchedulerService.hashval, json.loads(job.assignment)["targets"]))
 
         SchedulerService.release_lock()
 
@@ -284,11 +504,20 @@ class JobManager:
     def parse(job):
         """parse job and return data"""
 
-        module = yaml.safe_load(job.queue.config)["module"]
+        return JobManager.parse_output(job.queue.config, job.output_abspath, job.assignment)
+
+    @staticmethod
+    def parse_output(queue_config, output_path, assignment):
+        """parse job output, does not require database nor app context so it can run in worker process"""
+
+        if not REGISTERED_PARSERS:  # pragma: no cover  ; running in spawned worker process
+            load_parser_plugins()
+
+        module = yaml.safe_load(queue_config)["module"]
         parser_impl = REGISTERED_PARSERS[module]
-        pidb = parser_impl.parse_path(job.output_abspath)
+        pidb = parser_impl.parse_path(output_path)
 
-        for item in json.loads(job.assignment)["targets"]:
+        for item in json.loads(assignment)["targets"]:
             pidb.insert_target(item)
 
         return pidb
@@ -311,9 +540,8 @@ class JobManager:
             current_app.logger.error("cannot delete running job %s", job.id)
             raise RuntimeError("cannot delete running job")
 
-        opath = Path(job.output_abspath)
-        if opath.exists():
-            opath.unlink()
+        Path(job.output_abspath).unlink(missing_ok=True)
+        Path(job.output_partpath).unlink(missing_ok=True)
         db.session.delete(job)
         db.session.commit()
 
@@ -321,11 +549,55 @@ class JobManager:
 RandomTarget = namedtuple("RandomTarget", ["id", "target", "hashval"])
 
 
+class WorkListener:
+    """
+    scheduler work notifications listener
+
+    uses dedicated autocommit database connection (outside of the session) to LISTEN
+    for notifications sent by SchedulerService.notify_work
+    """
+
+    def __init__(self):
+        self.raw_connection = None
+        self.connection = None
+
+    def __enter__(self):
+        self.raw_connection = db.engine.raw_connection()
+        self.connection = self.raw_connection.driver_connection
+        self.connection.rollback()
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {SCHEDULER_NOTIFY_CHANNEL};")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.connection.cursor() as cursor:
+            cursor.execute("UNLISTEN *;")
+        self.connection.notifies.clear()
+        self.connection.autocommit = False
+        self.raw_connection.close()
+
+    def wait(self, timeout):
+        """
+        wait for notification
+
+        :return: true if notification was received within timeout
+        :rtype: bool
+        """
+
+        if not self.connection.notifies:
+            if select_fds([self.connection], [], [], timeout)[0]:
+                self.connection.poll()
+        received = bool(self.connection.notifies)
+        self.connection.notifies.clear()
+        return received
+
+
 class SchedulerServiceBusyException(Exception):
     """raised when timeout is reached when obtaining scheduling service lock"""
 
 
-class SchedulerService:
+class SchedulerService:  # pylint: disable=too-many-public-methods
     """
     rate-limiting scheduling service (nacelnik.mk1 design)
 
@@ -343,10 +615,17 @@ class SchedulerService:
     TIMEOUT_JOB_ASSIGN = 3
     TIMEOUT_JOB_OUTPUT = 30
     HEATMAP_GC_PROBABILITY = 0.1
+    # long-polling assignment waiters in this process, each holds listener connection
+    _assign_waiters = 0
+    _assign_waiters_lock = Lock()
 
     @staticmethod
     def get_lock(timeout=0):
-        """wait for database lock or raise exception"""
+        """
+        wait for shared database lock or raise exception
+
+        shared lock guards heatmap and readynets transitions which span over all queues
+        """
 
         try:
             db.session.execute(
@@ -360,55 +639,152 @@ class SchedulerService:
 
     @staticmethod
     def release_lock():
-        """release scheduling lock"""
+        """release shared scheduling lock"""
 
         db.session.execute(text("SELECT pg_advisory_unlock(:locknum);"), {"locknum": SCHEDULER_LOCK_NUMBER})
 
+    @staticmethod
+    def get_queue_lock(queue_id, timeout=0):
+        """
+        wait for queue database lock or raise exception
+
+        queue lock guards queue-local operations (target pop, enqueue, flush), operations on different
+        queues does not block each other. when both locks are required, queue lock must be acquired first.
+        """
+
+        try:
+            db.session.execute(
+                text("SET LOCAL lock_timeout=:timeout; SELECT pg_advisory_lock(:namespace, :queue_id);"),
+                {"timeout": timeout * 100, "namespace": SCHEDULER_QUEUE_LOCK_NAMESPACE, "queue_id": queue_id},
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            current_app.logger.warning("failed to acquire SchedulerService queue lock")
+            raise SchedulerServiceBusyException() from None
+
+    @staticmethod
+    def release_queue_lock(queue_id):
+        """release queue scheduling lock"""
+
+        db.session.execute(
+            text("SELECT pg_advisory_unlock(:namespace, :queue_id);"),
+            {"namespace": SCHEDULER_QUEUE_LOCK_NAMESPACE, "queue_id": queue_id},
+        )
+
+    @staticmethod
+    def get_job_lock(job_id, timeout=0):
+        """
+        wait for job database lock or raise exception
+
+        job lock guards streamed job output (partial output file) against concurrent repeated requests,
+        when shared lock is required as well, job lock must be acquired first.
+        """
+
+        try:
+            db.session.execute(
+                text("SET LOCAL lock_timeout=:timeout; SELECT pg_advisory_lock(:namespace, hashtext(:job_id));"),
+                {"timeout": timeout * 100, "namespace": SCHEDULER_JOB_LOCK_NAMESPACE, "job_id": job_id},
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            current_app.logger.warning("failed to acquire SchedulerService job lock")
+            raise SchedulerServiceBusyException() from None
+
+    @staticmethod
+    def release_job_lock(job_id):
+        """release job lock"""
+
+        db.session.execute(
+            text("SELECT pg_advisory_unlock(:namespace, hashtext(:job_id));"),
+            {"namespace": SCHEDULER_JOB_LOCK_NAMESPACE, "job_id": job_id},
+        )
+
+    @staticmethod
+    def notify_work():
+        """notify waiting job assignments about new work; delivered by database on transaction commit"""
+
+        db.session.execute(text("SELECT pg_notify(:channel, '');"), {"channel": SCHEDULER_NOTIFY_CHANNEL})
+
     @staticmethod
     def hashval(value):
         """computes rate-limit heatmap hash value"""
 
         return TargetManager.from_str(value).hashval()
 
-    @staticmethod
-    def heatmap_put(hashval):
+    @classmethod
+    def heatmap_put(cls, hashval):
         """account value (increment counter) in heatmap and update readynets"""
 
+        return cls.heatmap_put_many([hashval])[hashval]
+
+    @staticmethod
+    def heatmap_put_many(hashvals):
+        """account values (increment counters) in heatmap and update readynets, single upsert for all values"""
+
+        counts = Counter(hashvals)
+        if not counts:
+            return {}
+
         conn = db.session.connection()
-        heat_count = conn.execute(
-            pg_insert(Heatmap)
-            .values(hashval=hashval, count=1)
-            .on_conflict_do_update(constraint="heatmap_pkey", set_={"count": Heatmap.count + 1})
-            .returning(Heatmap.count)
-        ).scalar()
+        stmt = pg_insert(Heatmap).values([{"hashval": hashval, "count": count} for hashval, count in counts.items()])
+        heat_counts = dict(
+            conn.execute(
+                stmt.on_conflict_do_update(constraint="heatmap_pkey", set_={"count": Heatmap.count + stmt.excluded.count}).returning(
+                    Heatmap.hashval, Heatmap.count
+                )
+            ).all()
+        )
 
-        if current_app.config["SNER_HEATMAP_HOT_LEVEL"] and (heat_count >= current_app.config["SNER_HEATMAP_HOT_LEVEL"]):
-            conn.execute(delete(Readynet).filter(Readynet.hashval == hashval))
+        hot_level = current_app.config["SNER_HEATMAP_HOT_LEVEL"]
+        if hot_level and (hot_hashvals := [hashval for hashval, count in heat_counts.items() if count >= hot_level]):
+            conn.execute(delete(Readynet).filter(Readynet.hashval.in_(hot_hashvals)))
 
         db.session.commit()
-        return heat_count
+        return heat_counts
 
     @classmethod
     def heatmap_pop(cls, hashval):
         """account value (decrement counter) in heatmap and update readynets"""
 
+        return cls.heatmap_pop_many([hashval])[hashval]
+
+    @classmethod
+    def heatmap_pop_many(cls, hashvals):
+        """
+        account values (decrement counters) in heatmap and update readynets
+
+        counts are aggregated per hashval and applied with single upsert, readynets which
+        cooled down below hot level are re-activated for all queues by single insert-select
+        """
+
+        counts = Counter(hashvals)
+        if not counts:
+            return {}
+
         conn = db.session.connection()
-        heat_count = conn.execute(
-            pg_insert(Heatmap)
-            .values(hashval=hashval, count=1)
-            .on_conflict_do_update(constraint="heatmap_pkey", set_={"count": Heatmap.count - 1})
-            .returning(Heatmap.count)
-        ).scalar()
+        stmt = pg_insert(Heatmap).values([{"hashval": hashval, "count": count} for hashval, count in counts.items()])
+        heat_counts = dict(
+            conn.execute(
+                stmt.on_conflict_do_update(constraint="heatmap_pkey", set_={"count": Heatmap.count - stmt.excluded.count}).returning(
+                    Heatmap.hashval, Heatmap.count
+                )
+            ).all()
+        )
 
         if random() < cls.HEATMAP_GC_PROBABILITY:
             conn.execute(delete(Heatmap).filter(Heatmap.count == 0))
 
-        if current_app.config["SNER_HEATMAP_HOT_LEVEL"] and (heat_count + 1 == current_app.config["SNER_HEATMAP_HOT_LEVEL"]):
-            for queue_id in db.session.execute(select(func.distinct(Target.queue_id)).filter(Target.hashval == hashval)).scalars().all():
-                conn.execute(pg_insert(Readynet).values(queue_id=queue_id, hashval=hashval))
+        hot_level = current_app.config["SNER_HEATMAP_HOT_LEVEL"]
+        if hot_level and (cooled_hashvals := [hashval for hashval, count in heat_counts.items() if count < hot_level <= count + counts[hashval]]):
+            conn.execute(
+                pg_insert(Readynet)
+                .from_select(["queue_id", "hashval"], select(Target.queue_id, Target.hashval).filter(Target.hashval.in_(cooled_hashvals)).distinct())
+                .on_conflict_do_nothing(constraint="readynet_pkey")
+            )
+            cls.notify_work()
 
         db.session.commit()
-        return heat_count
+        return heat_counts
 
     @staticmethod
     def grep_hot_hashvals(hashvals):
@@ -432,7 +808,7 @@ class SchedulerService:
         * queue must be active
         * agent capabilities (caps) must conform queue requirements (reqs)
           no capabilities means all reqs (default agent handles anything)
-        * queue must have any rate-limit available targets/networks enqueued
+        * queue must have any rate-limit available targets/networks enqueued or prefetched assignment
         * must suffice client requested parameters (name)
         * queue is selected with priority in respect, but at random on same prio levels
 
@@ -440,7 +816,9 @@ class SchedulerService:
         :rtype: sner.server.scheduler.model.Queue
         """
 
-        query = select(Queue).filter(Queue.active, Queue.id.in_(select(distinct(Readynet.queue_id))))
+        query = select(Queue).filter(
+            Queue.active, or_(Queue.id.in_(select(distinct(Readynet.queue_id))), Queue.id.in_(select(distinct(Prefetch.queue_id))))
+        )
 
         if agent_caps:
             query = query.filter(Queue.reqs.contained_by(cast(agent_caps, pg_ARRAY(db.String))))
@@ -452,36 +830,181 @@ class SchedulerService:
         return db.session.execute(query).scalars().first()
 
     @staticmethod
-    def _pop_random_target(queue):
+    def _pop_random_targets(queue, count):
         """
-        pop random target from queue and update readynet info
+        pop up to count random targets from queue and update readynet info, changes are left
+        uncommitted to be committed along with heatmap accounting; queue lock must be held
 
-        :return: random target properties as tuple
-        :rtype: sner.server.scheduler.core.RandomTarget
+        targets are picked within single statement from count random readynets
+        round-robin (rank within readynet first), the heatmap headroom of each
+        readynet is respected so that the batch never overheats any of them.
+
+        :return: random targets properties as tuples
+        :rtype: list of sner.server.scheduler.core.RandomTarget
         """
 
         conn = db.session.connection()
-
-        readynet_hashval = conn.execute(select(Readynet.hashval).filter(Readynet.queue_id == queue.id).order_by(func.random()).limit(1)).scalar()
-        if not readynet_hashval:
-            return None
-
-        target_id, target = conn.execute(
-            select(Target.id, Target.target).filter(Target.queue_id == queue.id, Target.hashval == readynet_hashval).order_by(func.random()).limit(1)
-        ).first()
-
-        conn.execute(delete(Target).filter(Target.id == target_id))
-        # prune readynet if no targets left for current queue
-        conn.execute(
-            delete(Readynet).filter(
-                Readynet.queue_id == queue.id,
-                Readynet.hashval == readynet_hashval,
-                select(func.count(Target.id)).filter(Target.queue_id == queue.id, Target.hashval == readynet_hashval).scalar_subquery() == 0,
+        hot_level = current_app.config["SNER_HEATMAP_HOT_LEVEL"]
+
+        readynets = select(Readynet.hashval).filter(Readynet.queue_id == queue.id).order_by(func.random()).limit(count).subquery()
+        candidates = (
+            select(
+                Target.id,
+                func.row_number().over(partition_by=Target.hashval, order_by=func.random()).label("rank"),
+                func.coalesce(Heatmap.count, 0).label("heat"),
             )
+            .join(readynets, Target.hashval == readynets.c.hashval)
+            .outerjoin(Heatmap, Heatmap.hashval == Target.hashval)
+            .filter(Target.queue_id == queue.id)
+            .subquery()
         )
+        picked = select(candidates.c.id)
+        if hot_level:
+            picked = picked.filter(candidates.c.heat + candidates.c.rank <= hot_level)
+        picked = picked.order_by(candidates.c.rank, func.random()).limit(count)
+
+        rtargets = [
+            RandomTarget(*row)
+            for row in conn.execute(delete(Target).filter(Target.id.in_(picked)).returning(Target.id, Target.target, Target.hashval)).all()
+        ]
+
+        if rtargets:
+            # prune readynets if no targets left for current queue
+            conn.execute(
+                delete(Readynet).filter(
+                    Readynet.queue_id == queue.id,
+                    Readynet.hashval.in_({item.hashval for item in rtargets}),
+                    ~select(Target.id).filter(Target.queue_id == queue.id, Target.hashval == Readynet.hashval).exists(),
+                )
+            )
 
-        db.session.commit()
-        return RandomTarget(target_id, target, readynet_hashval)
+        return rtargets
+
+    @staticmethod
+    def _slice_ranges(queue, rtargets, count):
+        """
+        slice popped range targets into host targets
+
+        every popped item holds single slot reserved by pop, ranges are extended to fill the rest
+        of requested count up to the heatmap headroom of the range hashval. range remainders are
+        returned back to the queue along with their readynets. changes are left uncommitted.
+
+        :return: random targets with ranges replaced by host targets
+        :rtype: list of sner.server.scheduler.core.RandomTarget
+        """
+
+        ranges = [item for item in rtargets if item.target.startswith("range,")]
+        if not ranges:
+            return rtargets
+
+        conn = db.session.connection()
+        hot_level = current_app.config["SNER_HEATMAP_HOT_LEVEL"]
+        heat = Counter(item.hashval for item in rtargets)
+        heat.update(dict(conn.execute(select(Heatmap.hashval, Heatmap.count).filter(Heatmap.hashval.in_({item.hashval for item in ranges}))).all()))
+        spare = count - len(rtargets)
+
+        sliced = [item for item in rtargets if item not in ranges]
+        remainders = []
+        for item in ranges:
+            extra = min(spare, hot_level - heat[item.hashval]) if hot_level else spare
+            hosts, remainder = TargetManager.from_str(item.target).slice(1 + extra)
+            heat[item.hashval] += len(hosts) - 1
+            spare -= len(hosts) - 1
+            sliced += [RandomTarget(None, str(host), item.hashval) for host in hosts]
+            if remainder:
+                remainders.append({"queue_id": queue.id, "target": str(remainder), "hashval": item.hashval})
+
+        if remainders:
+            conn.execute(pg_insert(Target), remainders)
+            conn.execute(
+                pg_insert(Readynet)
+                .values([{"queue_id": item["queue_id"], "hashval": item["hashval"]} for item in remainders])
+                .on_conflict_do_nothing(constraint="readynet_pkey")
+            )
+
+        return sliced
+
+    @classmethod
+    def _account_targets(cls, queue, rtargets):
+        """
+        account popped targets in heatmap and commit the pop; shared lock is held only for the accounting
+
+        headroom observed by the pop might have been consumed meanwhile by concurrent assignment
+        from other queue, targets which would overheat their readynet are returned back to the queue.
+        if shared lock cannot be acquired, the pop is rolled back.
+
+        :return: accepted targets
+        :rtype: list of sner.server.scheduler.core.RandomTarget
+        """
+
+        if not rtargets:
+            db.session.commit()
+            return []
+
+        cls.get_lock(cls.TIMEOUT_JOB_ASSIGN)
+
+        heat_counts = cls.heatmap_put_many([item.hashval for item in rtargets])
+        hot_level = current_app.config["SNER_HEATMAP_HOT_LEVEL"]
+        overheat = {hashval: count - hot_level for hashval, count in heat_counts.items() if hot_level and count > hot_level}
+
+        accepted = []
+        returned = []
+        for item in rtargets:
+            if overheat.get(item.hashval, 0) > 0:
+                overheat[item.hashval] -= 1
+                returned.append(item)
+            else:
+                accepted.append(item)
+
+        if returned:
+            db.session.connection().execute(
+                pg_insert(Target), [{"queue_id": queue.id, "target": item.target, "hashval": item.hashval} for item in returned]
+            )
+            cls.heatmap_pop_many([item.hashval for item in returned])
+
+        cls.release_lock()
+        return accepted
+
+    @classmethod
+    def _assign_targets(cls, queue, exclist):
+        """
+        pop group of targets from queue and account them in heatmap; queue lock must be held
+
+        if shared lock cannot be acquired, already accounted targets are returned as a partial group.
+
+        :return: assigned targets
+        :rtype: list
+        """
+
+        assigned_targets = []
+        while len(assigned_targets) < queue.group_size:
+            rtargets = cls._pop_random_targets(queue, queue.group_size - len(assigned_targets))
+            if not rtargets:
+                db.session.commit()
+                break
+            rtargets = cls._slice_ranges(queue, rtargets, queue.group_size - len(assigned_targets))
+            accepted = [item for item in rtargets if not exclist.match(item.target)]
+            try:
+                assigned_targets += [item.target for item in cls._account_targets(queue, accepted)]
+            except SchedulerServiceBusyException:
+                if not assigned_targets:
+                    raise
+                break
+        return assigned_targets
+
+    @staticmethod
+    def _pop_prefetch(queue_id):
+        """
+        pop oldest prefetched assignment for queue, concurrent requests skip each others rows
+
+        :return: prefetched targets or None
+        :rtype: list
+        """
+
+        oldest = select(Prefetch.id).filter(Prefetch.queue_id == queue_id).order_by(Prefetch.id).limit(1).with_for_update(skip_locked=True)
+        stmt = delete(Prefetch).filter(Prefetch.id == oldest.scalar_subquery()).returning(Prefetch.targets)
+        targets = db.session.execute(stmt).scalar_one_or_none()
+        return json.loads(targets) if targets else None
 
     @classmethod
     def job_assign(cls, queue_name, agent_caps):
@@ -489,92 +1012,240 @@ class SchedulerService:
         assign job for agent
 
         * select suitable queue
-        * pop random target
-            * select random readynet for queue (readynets reflects current rate-limit heatmap state)
-            * pop random target within selected readynet
-            * cleanup readynet if queue does not hold any target in same readynet
-        * update rate-limit heatmap
-            * deactivate readynet for all queues if it becomes hot
+        * use prefetched assignment if available (targets and heatmap already accounted by prefetch_fill)
+        * pop batch of random targets
+            * select random readynets for queue (readynets reflects current rate-limit heatmap state)
+            * pop random targets within selected readynets respecting heatmap hot level
+            * slice popped range targets into host targets, return remainders back to queue
+            * cleanup readynets if queue does not hold any target in same readynet
+        * update rate-limit heatmap for whole batch
+            * return targets back to queue if concurrent assignment consumed the heatmap headroom
+            * deactivate readynets for all queues if they become hot
+        * repeat if batch was not sufficient to fill the group (exclusions, rate-limits)
+
+        queue lock is held during target pop and job creation, shared lock is held only
+        for heatmap accounting of each popped batch, so the assignments from different
+        queues are serialized only on the heatmap update.
         """
 
-        cls.get_lock(cls.TIMEOUT_JOB_ASSIGN)
-
         assignment = {}  # nowork
-        assigned_targets = []
-        exclist = ExclMatcher(current_app.config["SNER_EXCLUSIONS"])
+        exclist = ExclMatcher.from_config(current_app.config["SNER_EXCLUSIONS"])
 
         queue = cls._get_assignment_queue(queue_name, agent_caps)
         if not queue:
-            SchedulerService.release_lock()
             return assignment
 
-        while len(assigned_targets) < queue.group_size:
-            rtarget = cls._pop_random_target(queue)
-            if not rtarget:
-                break
-            if exclist.match(rtarget.target):
-                continue
-            assigned_targets.append(rtarget.target)
-            cls.heatmap_put(rtarget.hashval)
+        if prefetched_targets := cls._pop_prefetch(queue.id):
+            assignment = JobManager.create(queue, prefetched_targets)
+            current_app.logger.info(f"SchedulerService job_assign {assignment['id']} ({queue.name}, prefetched)")
+            return assignment
+
+        queue_id = queue.id
+        cls.get_queue_lock(queue_id, cls.TIMEOUT_JOB_ASSIGN)
 
+        try:
+            assigned_targets = cls._assign_targets(queue, exclist)
+        except SchedulerServiceBusyException:
+            cls.release_queue_lock(queue_id)
+            raise
         if assigned_targets:
             assignment = JobManager.create(queue, assigned_targets)
 
-        cls.release_lock()
+        cls.release_queue_lock(queue_id)
         if assignment:
             current_app.logger.info(f"SchedulerService job_assign {assignment['id']} ({queue.name})")
         return assignment
 
     @classmethod
-    def job_output(cls, job, retval, output):
+    def prefetch_fill(cls, size):
+        """
+        fill prefetch buffers of active queues up to size assignments. queues locked by
+        concurrent operations are skipped until next fill.
+
+        :return: number of prefetched assignments
+        :rtype: int
+        """
+
+        exclist = ExclMatcher.from_config(current_app.config["SNER_EXCLUSIONS"])
+        buffered = dict(db.session.execute(select(Prefetch.queue_id, func.count(Prefetch.id)).group_by(Prefetch.queue_id)).all())
+        queues = db.session.execute(select(Queue).filter(Queue.active, Queue.id.in_(select(distinct(Readynet.queue_id))))).scalars().all()
+
+        count = 0
+        for queue in queues:
+            if (missing := size - buffered.get(queue.id, 0)) <= 0:
+                continue
+
+            queue_id = queue.id
+            try:
+                cls.get_queue_lock(queue_id, cls.TIMEOUT_JOB_ASSIGN)
+            except SchedulerServiceBusyException:
+                continue
+
+            for _ in range(missing):
+                try:
+                    assigned_targets = cls._assign_targets(queue, exclist)
+                except SchedulerServiceBusyException:
+                    break
+                if not assigned_targets:
+                    break
+                db.session.add(Prefetch(queue_id=queue_id, targets=json.dumps(assigned_targets)))
+                cls.notify_work()
+                count += 1
+                db.session.commit()
+
+            cls.release_queue_lock(queue_id)
+
+        return count
+
+    @classmethod
+    def prefetch_reclaim(cls, max_age):
+        """
+        return prefetched assignments older than max_age seconds back to their queues,
+        targets are enqueued first, shared lock is acquired only to release heatmap counts
+
+        :return: number of reclaimed assignments
+        :rtype: int
+        """
+
+        horizont = datetime.utcnow() - timedelta(seconds=max_age)
+        expired = db.session.execute(delete(Prefetch).filter(Prefetch.time_created <= horizont).returning(Prefetch.queue_id, Prefetch.targets)).all()
+        if not expired:
+            return 0
+
+        queue_targets = defaultdict(list)
+        for queue_id, targets in expired:
+            queue_targets[queue_id] += json.loads(targets)
+        for queue_id, targets in queue_targets.items():
+            QueueManager.enqueue(db.session.get(Queue, queue_id), TargetManager.from_list(targets))
+
+        cls.get_lock()
+        cls.heatmap_pop_many(map(cls.hashval, chain.from_iterable(queue_targets.values())))
+        cls.release_lock()
+        return len(expired)
+
+    @classmethod
+    def _acquire_assign_waiter(cls):
+        """acquire one of limited process-wide assignment waiter slots"""
+
+        with cls._assign_waiters_lock:
+            if cls._assign_waiters >= current_app.config["SNER_ASSIGN_WAITERS_MAX"]:
+                return False
+            cls._assign_waiters += 1
+            return True
+
+    @classmethod
+    def _release_assign_waiter(cls):
+        """release assignment waiter slot"""
+
+        with cls._assign_waiters_lock:
+            cls._assign_waiters -= 1
+
+    @classmethod
+    def job_assign_wait(cls, queue_name, agent_caps, timeout):
+        """
+        assign job for agent, wait up to timeout seconds for the work to become available
+
+        listener is registered before first assignment attempt, so the work enqueued meanwhile
+        is not missed. assignment is retried on every notification until deadline. each waiter
+        holds dedicated listener connection, over the waiters limit the assignment does not wait.
+        """
+
+        if not cls._acquire_assign_waiter():
+            return cls.job_assign(queue_name, agent_caps)
+
+        try:
+            return cls._job_assign_wait(queue_name, agent_caps, timeout)
+        finally:
+            cls._release_assign_waiter()
+
+    @classmethod
+    def _job_assign_wait(cls, queue_name, agent_caps, timeout):
+        """assign job for agent, wait for work notifications until deadline"""
+
+        deadline = monotonic() + timeout
+        with WorkListener() as listener:
+            while not (assignment := cls.job_assign(queue_name, agent_caps)) and ((remaining := deadline - monotonic()) > 0):
+                # do not hold session transaction while idle
+                db.session.commit()
+                listener.wait(remaining)
+        return assignment
+
+    @classmethod
+    def job_output(cls, job, retval, output=None):
         """
         receive output from assigned job
 
-        * for each target update rate-limit heatmap
+        * store output data into request private staging file outside of the lock
+            * output None means output already streamed by JobManager.write_output_stream into
+              partial output file, job lock must be held by caller
+        * discard the output if the job has been finished meanwhile by concurrent (repeated) request
+        * move staged output in place under the lock
+        * update rate-limit heatmap for all targets at once
             * if readynet of the target becomes cool activate it for all queues
+
+        :return: False if job was already finished and the output was discarded
+        :rtype: bool
         """
 
-        cls.get_lock(cls.TIMEOUT_JOB_OUTPUT)
+        staged = job.output_partpath if output is None else JobManager.write_output(job, output)
 
-        JobManager.finish(job, retval, output)
-        for target in json.loads(job.assignment)["targets"]:
-            cls.heatmap_pop(cls.hashval(target))
+        try:
+            cls.get_lock(cls.TIMEOUT_JOB_OUTPUT)
+        except SchedulerServiceBusyException:
+            # streamed partial output is kept for upload resume
+            if output is not None:
+                Path(staged).unlink()
+            raise
+
+        db.session.refresh(job)
+        if job.retval is not None:
+            cls.release_lock()
+            Path(staged).unlink(missing_ok=True)
+            current_app.logger.warning(f"SchedulerService job_output {job.id} already finished, output discarded")
+            return False
+
+        JobManager.finish(job, retval, staged)
+        cls.heatmap_pop_many(map(cls.hashval, json.loads(job.assignment)["targets"]))
 
         cls.release_lock()
         current_app.logger.info(f"SchedulerService job_output {job.id} ({job.queue.name})")
+        return True
 
     @classmethod
     def readynet_recount(cls):
         """
         rescan targets and update readynets table for new heatmap hot level
+
+        :return: number of (re)activated readynets
+        :rtype: int
         """
 
         cls.get_lock()
         conn = db.session.connection()
 
+        candidates = select(Target.queue_id, Target.hashval).distinct()
         if current_app.config["SNER_HEATMAP_HOT_LEVEL"]:
-            hot_hashvals = set(
-                conn.execute(select(Heatmap.hashval).filter(Heatmap.count >= current_app.config["SNER_HEATMAP_HOT_LEVEL"])).scalars().all()
-            )
+            hot_hashvals = select(Heatmap.hashval).filter(Heatmap.count >= current_app.config["SNER_HEATMAP_HOT_LEVEL"])
 
             # all heatmap hashvals over limit remove from readynet
             conn.execute(delete(Readynet).filter(Readynet.hashval.in_(hot_hashvals)))
-        else:
-            hot_hashvals = set()
+            candidates = candidates.filter(Target.hashval.not_in(hot_hashvals))
 
         # for all target hashvals except over limit insert as readynet for all queues
-        all_hashvals = set(conn.execute(select(func.distinct(Target.hashval))).scalars().all())
-        for thashval in all_hashvals - hot_hashvals:
-            for queue_id in conn.execute(select(func.distinct(Target.queue_id)).filter(Target.hashval == thashval)).scalars().all():
-                conn.execute(pg_insert(Readynet).values(queue_id=queue_id, hashval=thashval).on_conflict_do_nothing(constraint="readynet_pkey"))
+        count = conn.execute(
+            pg_insert(Readynet).from_select(["queue_id", "hashval"], candidates).on_conflict_do_nothing(constraint="readynet_pkey")
+        ).rowcount
+        if count:
+            cls.notify_work()
 
         db.session.commit()
         cls.release_lock()
+        return count
 
     @classmethod
     def heatmap_check(cls):
         """
-        check if heatmap corresponds with assigned targets from running jobs
+        check if heatmap corresponds with assigned targets from running jobs and prefetched assignments
 
         :return: True if the database is in an okay state, False otherwise.
         :rtype: bool
@@ -586,6 +1257,9 @@ class SchedulerService:
         for job in Job.query.filter(Job.retval == None).all():  # noqa: E711  pylint: disable=singleton-comparison
             for target in json.loads(job.assignment)["targets"]:
                 ref_heatmap[SchedulerService.hashval(target)] += 1
+        for prefetch in Prefetch.query.all():
+            for target in json.loads(prefetch.targets):
+                ref_heatmap[SchedulerService.hashval(target)] += 1
 
         db_heatmap = {item.hashval: item.count for item in Heatmap.query.all() if item.count != 0}
 
@@ -601,9 +1275,13 @@ class SchedulerService:
 
     @classmethod
     def repeat_failed_jobs(cls):
-        """repeat and prune failed jobs, tries to recover from deployment restart"""
+        """
+        repeat and prune failed jobs, tries to recover from deployment restart
+
+        finished jobs does not hold any heatmap counts, shared lock is not required and must not be
+        held while enqueueing targets (queue lock must be acquired first).
+        """
 
-        cls.get_lock()
         count = 0
         for job in Job.query.filter(
             Job.retval != None,  # noqa: E711  pylint: disable=singleton-comparison  ; not running jobs
@@ -613,7 +1291,6 @@ class SchedulerService:
             JobManager.repeat(job)
             JobManager.delete(job)
             count += 1
-        cls.release_lock()
         current_app.logger.info(f"SchedulerService repeat_failed_jobs, {count} jobs repeated")
 
     @classmethod
@@ -622,9 +1299,11 @@ class SchedulerService:
         reconcile and repeat all jobs except sucessfuly finished and planner failed jobs
         and cleanup heatmap. this is used when all agents are explicitly stopped to recover
         from inconsistent heatmap state
+
+        jobs and prefetches are repeated before the shared lock is acquired, the targets are
+        enqueued under queue locks which must not be acquired while holding the shared lock.
         """
 
-        cls.get_lock()
         count = 0
         for job in Job.query.filter(
             or_(
@@ -640,7 +1319,9 @@ class SchedulerService:
             JobManager.repeat(job)
             JobManager.delete(job)
             count += 1
+        cls.prefetch_reclaim(0)
 
+        cls.get_lock()
         Heatmap.query.delete()
         db.session.commit()
         cls.readynet_recount()
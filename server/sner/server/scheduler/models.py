@@ -27,6 +27,7 @@ class Queue(db.Model):
 
     targets = relationship("Target", back_populates="queue", cascade="delete,delete-orphan", passive_deletes=True)
     jobs = relationship("Job", back_populates="queue", cascade="delete,delete-orphan", passive_deletes=True)
+    prefetches = relationship("Prefetch", back_populates="queue", cascade="delete,delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<Queue {self.id}: {self.name}>"
@@ -83,6 +84,22 @@ class Readynet(db.Model):
         return f"<Readynet {self.queue_id} {self.hashval}>"
 
 
+class Prefetch(db.Model):
+    """prefetched assignment targets, already accounted in heatmap"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    queue_id = db.Column(db.Integer, db.ForeignKey("queue.id", ondelete="CASCADE"), nullable=False)
+    targets = db.Column(db.Text, nullable=False)
+    time_created = db.Column(db.DateTime, default=datetime.utcnow)
+
+    queue = relationship("Queue", back_populates="prefetches")
+
+    __table_args__ = (Index("prefetch_queueid", "queue_id"),)  # job_assign: pop prefetched assignment for queue
+
+    def __repr__(self):
+        return f"<Prefetch {self.id}: {self.queue_id}>"
+
+
 class Job(db.Model):
     """assigned job"""
 
@@ -102,3 +119,8 @@ class Job(db.Model):
     def output_abspath(self):
         """return absolute path to the output data file acording to current app config"""
         return os.path.join(self.queue.data_abspath, self.id)
+
+    @property
+    def output_partpath(self):
+        """return absolute path to the partially uploaded output data file"""
+        return f"{self.output_abspath}.part"
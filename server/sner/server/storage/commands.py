@@ -12,7 +12,7 @@ from flask import current_app
 from flask.cli import with_appcontext
 
 from sner.server.extensions import db
-from sner.server.parser import REGISTERED_PARSERS
+from sner.server.parser import REGISTERED_PARSERS, ParsedCache
 from sner.server.storage.core import StorageManager, vuln_export, vuln_report
 from sner.server.storage.models import Host, Versioninfo
 from sner.server.storage.service_list import service_list
@@ -22,6 +22,11 @@ from sner.server.utils import FilterQueryError
 logger = logging.getLogger("sner_command")
 
 
+def parsed_cache():
+    """parsed items cache from app config"""
+    return ParsedCache(Path(current_app.config["SNER_VAR"]) / "parsed_cache", current_app.config["SNER_PARSED_CACHE_MAX_SIZE"])
+
+
 @click.group(name="storage", help="sner.server storage management")
 def command():
     """storage commands container"""
@@ -31,6 +36,7 @@ def command():
 @with_appcontext
 @click.option("--dry", is_flag=True, help="do not update database, only print new items")
 @click.option("--addtag", multiple=True, help="add tag to all imported objects, can be used several times")
+@click.option("--cache", is_flag=True, help="use parsed items cache")
 @click.argument("parser")
 @click.argument("path", nargs=-1)
 def storage_import(path, parser, **kwargs):
@@ -40,21 +46,55 @@ def storage_import(path, parser, **kwargs):
         logger.error("no such parser")
         sys.exit(1)
 
-    parser_impl = REGISTERED_PARSERS[parser]
+    cache = parsed_cache()
     for item in path:
         if not Path(item).is_file():
             current_app.logger.warning(f'invalid path "{item}"')
             continue
 
         try:
+            pidb = cache.parse(parser, item) if kwargs.get("cache") else REGISTERED_PARSERS[parser].parse_path(item)
             if kwargs.get("dry"):
-                StorageManager.import_parsed_dryrun(parser_impl.parse_path(item))
+                StorageManager.import_parsed_dryrun(pidb)
             else:
-                StorageManager.import_parsed(parser_impl.parse_path(item), addtags=list(kwargs["addtag"]))
+                StorageManager.import_parsed(pidb, addtags=list(kwargs["addtag"]))
         except Exception as exc:  # pylint: disable=broad-except
             current_app.logger.warning(f"failed to parse {item}, {repr(exc)}")
             db.session.rollback()
 
+    if kwargs.get("cache"):
+        cache.evict()
+
+
+@command.command(name="parsed-cache-warm", help="parse files into parsed items cache")
+@with_appcontext
+@click.argument("parser")
+@click.argument("path", nargs=-1)
+def storage_parsed_cache_warm(path, parser):
+    """warm parsed items cache"""
+
+    if parser not in REGISTERED_PARSERS:
+        logger.error("no such parser")
+        sys.exit(1)
+
+    cache = parsed_cache()
+    for item in path:
+        try:
+            cache.parse(parser, item)
+        except Exception as exc:  # pylint: disable=broad-except
+            current_app.logger.warning(f"failed to parse {item}, {repr(exc)}")
+    cache.evict()
+
+
+@command.command(name="parsed-cache-evict", help="evict least recently used entries from parsed items cache")
+@with_appcontext
+@click.option("--max-size", type=int, default=0, help="evict until cache size fits max size in bytes; evicts all by default")
+def storage_parsed_cache_evict(**kwargs):
+    """evict parsed items cache"""
+
+    evicted = parsed_cache().evict(kwargs["max_size"])
+    print(f"parsed-cache-evict, {evicted} entries evicted")
+
 
 @command.command(name="flush", help="flush all objects from storage")
 @with_appcontext
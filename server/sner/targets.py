@@ -34,20 +34,34 @@ sixenum,2001:db8::0-ffff
 auror,192.0.2.10,port=25,hostname=mail,enc=E
 auror,2001:db8::10,port=995,hostname=mail.example.com,enc=I
 
+### Range
+
+range,192.0.2.0-192.0.2.255
+range,2001:db8::-2001:db8::ffff
+
+Compact range of host targets stored as single queue row, the range never crosses
+heatmap hashval network boundary. Scheduler slices it into host targets at assignment time.
+
 """
 
 import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from ipaddress import ip_address, ip_network
+from ipaddress import ip_address, ip_network, summarize_address_range
 
 from sner.lib import is_ipv6_address
 
 
+def hashval_prefixlen(version):
+    """return prefix length of the scheduling heatmap network for ip version"""
+
+    return 48 if version == 6 else 24
+
+
 def address_hashval(value):
     """return address hashval for scheduling heatmap"""
 
-    prefix = 48 if is_ipv6_address(value) else 24
+    prefix = hashval_prefixlen(6 if is_ipv6_address(value) else 4)
     return str(ip_network(f"{value}/{prefix}", strict=False))
 
 
@@ -222,11 +236,60 @@ class AurorTestsslTarget(TargetBase):
         return is_ipv6_address(self.address)
 
 
+@dataclass(frozen=True)
+class RangeTarget(TargetBase):
+    """compact address range target, sliced into host targets by scheduler"""
+
+    REGEXP = re.compile(r"range,(?P<first>[0-9a-fA-F:.]+)-(?P<last>[0-9a-fA-F:.]+)$")
+
+    first: str
+    last: str
+
+    def __str__(self):
+        return f"range,{self.first}-{self.last}"
+
+    def hashval(self):
+        return address_hashval(self.first)
+
+    def scope(self):
+        # range is never imported to storage directly, scope is formed by the networks covering the range
+        return tuple(str(network) for network in summarize_address_range(ip_address(self.first), ip_address(self.last)))
+
+    def is_ipv6_address(self):
+        return is_ipv6_address(self.first)
+
+    def size(self):
+        """return number of addresses in range"""
+        return int(ip_address(self.last)) - int(ip_address(self.first)) + 1
+
+    def slice(self, count):
+        """
+        split first count addresses from range
+
+        :return: tuple of host targets and range remainder (None if range was exhausted)
+        """
+
+        first, last = ip_address(self.first), ip_address(self.last)
+        end = first + (min(count, self.size()) - 1)
+        hosts = [HostTarget(str(first + idx)) for idx in range(int(end) - int(first) + 1)]
+        remainder = RangeTarget(str(end + 1), self.last) if end < last else None
+        return hosts, remainder
+
+    @classmethod
+    def from_network(cls, value):
+        """return list of ranges covering all addresses of network, aligned to heatmap hashval networks"""
+
+        network = ip_network(value, strict=False)
+        prefix = hashval_prefixlen(network.version)
+        subnets = network.subnets(new_prefix=prefix) if network.prefixlen < prefix else [network]
+        return [cls(str(subnet.network_address), str(subnet.broadcast_address)) for subnet in subnets]
+
+
 class TargetManager:
     """target manager"""
 
     @classmethod
-    def from_str(cls, value):
+    def from_str(cls, value):  # pylint: disable=too-many-return-statements
         """factory function"""
 
         if value.startswith("host,"):
@@ -244,6 +307,9 @@ class TargetManager:
         if value.startswith("auror,") and (match := AurorTestsslTarget.REGEXP.match(value)):
             return AurorTestsslTarget(match.group("address"), int(match.group("port")), match.group("hostname"), match.group("enc"))
 
+        if value.startswith("range,") and (match := RangeTarget.REGEXP.match(value)):
+            return RangeTarget(match.group("first"), match.group("last"))
+
         return GenericTarget(value)
 
     @classmethod
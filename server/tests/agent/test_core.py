@@ -3,15 +3,25 @@
 agent basic tests
 """
 
+import errno
 import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pipe
 from pathlib import Path
+from threading import Event
+from unittest.mock import patch
 from uuid import uuid4
 
+import pytest
 from flask import url_for
 
+from sner.agent.core import DEFAULT_CONFIG, OutputSpool, PoolWorkerAgent, ServerableAgent
 from sner.agent.core import main as agent_main
+from sner.agent.modules import ModuleBase
 from sner.lib import file_from_zip
 from sner.server.extensions import db
+from sner.server.scheduler.core import SchedulerService
 from sner.server.scheduler.models import Job, Queue
 
 
@@ -64,3 +74,188 @@ def test_run_with_liveserver(tmpworkdir, live_server, apikey_agent, dummy_target
 
     job = Job.query.filter(Job.queue_id == dummy_target.queue_id).one()
     assert dummy_target.target in file_from_zip(job.output_abspath, "assignment.json").decode("utf-8")
+
+
+def test_run_pool_with_liveserver(tmpworkdir, live_server, apikey_agent, dummy_target):  # pylint: disable=unused-argument
+    """test worker pool agent codepath; fetch, execute in worker process, pack and upload assignment"""
+
+    result = agent_main(
+        [
+            "--server",
+            url_for("frontend.index_route", _external=True),
+            "--apikey",
+            apikey_agent,
+            "--queue",
+            db.session.get(Queue, dummy_target.queue_id).name,
+            "--workers",
+            "2",
+            "--oneshot",
+        ]
+    )
+    assert result == 0
+
+    job = Job.query.filter(Job.queue_id == dummy_target.queue_id).one()
+    assert dummy_target.target in file_from_zip(job.output_abspath, "assignment.json").decode("utf-8")
+
+
+def test_pool_worker_agent(tmpworkdir):  # pylint: disable=unused-argument
+    """test pool worker agent processes assignment passed from parent and reports retval"""
+
+    test_a = {"id": str(uuid4()), "config": {"module": "dummy", "args": ["--arg1"]}, "targets": []}
+    parent_conn, child_conn = Pipe(duplex=False)
+
+    assert PoolWorkerAgent().run(assignment=test_a, conn=child_conn) == 0
+    assert parent_conn.recv() == 0
+    assert Path(f"{test_a['id']}.zip").exists()
+
+
+def test_pool_slot_available(tmpworkdir):  # pylint: disable=unused-argument
+    """test worker pool module concurrency limits"""
+
+    agent = ServerableAgent({**DEFAULT_CONFIG, "WORKERS": 3, "MODULE_CONCURRENCY": {"nessus": 1}})
+    nessus_a = {"id": str(uuid4()), "config": {"module": "nessus"}, "targets": []}
+    nmap_a = {"id": str(uuid4()), "config": {"module": "nmap"}, "targets": []}
+
+    assert agent.pool_slot_available(nessus_a)
+    agent.pool["conn1"] = (None, nessus_a)
+    assert not agent.pool_slot_available(nessus_a)
+    assert agent.pool_slot_available(nmap_a)
+    agent.pool["conn2"] = (None, nmap_a)
+    agent.pool["conn3"] = (None, nmap_a)
+    assert not agent.pool_slot_available(nmap_a)
+
+
+def test_pool_config_validation(tmpworkdir):  # pylint: disable=unused-argument
+    """test worker pool limits validation"""
+
+    with pytest.raises(ValueError):
+        ServerableAgent({**DEFAULT_CONFIG, "WORKERS": 0})
+    with pytest.raises(ValueError):
+        ServerableAgent({**DEFAULT_CONFIG, "WORKERS": 2, "MODULE_CONCURRENCY": {"nessus": 0}})
+
+
+def test_pool_unstartable_assignment(tmpworkdir):  # pylint: disable=unused-argument
+    """test worker pool abandons assignment which cannot be started in empty pool"""
+
+    agent = ServerableAgent({**DEFAULT_CONFIG, "WORKERS": 2, "ONESHOT": True})
+    agent.module_concurrency = {"dummy": 0}
+    test_a = {"id": str(uuid4()), "config": {"module": "dummy"}, "targets": []}
+
+    with (
+        patch.object(agent, "get_assignment", return_value=(test_a, 0)),
+        patch.object(agent, "abandon_assignment") as abandon_mock,
+    ):
+        assert agent.run() == 0
+    abandon_mock.assert_called_once_with(test_a)
+
+
+def test_output_spool(tmpworkdir):  # pylint: disable=unused-argument
+    """test output spool ordering and size limit"""
+
+    spool = OutputSpool("spool", 10)
+    ids = [str(uuid4()), str(uuid4())]
+    for idx, assignment_id in enumerate(ids):
+        Path(f"{assignment_id}.zip").write_bytes(b"12345")
+        spool.put(assignment_id, -idx, f"{assignment_id}.zip")
+
+    assert [(item[1], item[2]) for item in spool.items()] == [(ids[0], 0), (ids[1], -1)]
+    assert spool.size() == 10
+    assert spool.full()
+    assert not OutputSpool("spool", 0).full()
+
+    # output is copied when spool resides on other filesystem
+    assignment_id = str(uuid4())
+    Path(f"{assignment_id}.zip").write_bytes(b"12345")
+    with patch("os.rename", side_effect=OSError(errno.EXDEV, "Invalid cross-device link")):
+        spool.put(assignment_id, 0, f"{assignment_id}.zip")
+    assert not Path(f"{assignment_id}.zip").exists()
+    assert [item[1] for item in spool.items()] == [*ids, assignment_id]
+
+    # stale partially moved outputs are cleaned up
+    Path("spool/1_stale_0.zip.tmp").write_bytes(b"123")
+    OutputSpool("spool", 0)
+    assert not Path("spool/1_stale_0.zip.tmp").exists()
+
+
+def test_abandon_assignment(tmpworkdir):  # pylint: disable=unused-argument
+    """test fetched assignment abandoned on terminate is reported as failed or spooled"""
+
+    agent = ServerableAgent(DEFAULT_CONFIG)
+    test_a = {"id": str(uuid4()), "config": {"module": "dummy"}, "targets": []}
+
+    with patch.object(agent, "upload_output", return_value=True) as upload_mock:
+        agent.abandon_assignment(test_a)
+    assert upload_mock.call_args.args[:2] == (test_a["id"], 1)
+    assert not Path(f"{test_a['id']}.zip").exists()
+    assert not list(agent.spool.items())
+
+    with patch.object(agent, "upload_output", return_value=False):
+        agent.abandon_assignment(test_a)
+    assert [item[1:] for item in agent.spool.items()] == [(test_a["id"], 1)]
+
+
+def test_thread_sessions(tmpworkdir):  # pylint: disable=unused-argument
+    """test each agent thread uses own http session"""
+
+    agent = ServerableAgent(DEFAULT_CONFIG)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        thread_session = executor.submit(lambda: agent.session).result()
+
+    assert agent.session is agent.session
+    assert thread_session is not agent.session
+
+
+def test_spool_uploader_terminated(tmpworkdir):  # pylint: disable=unused-argument
+    """test spool uploader final pass on terminate uses short network timeout"""
+
+    agent = ServerableAgent(DEFAULT_CONFIG)
+    agent.terminated = True
+    stop = Event()
+    stop.set()
+
+    with patch.object(agent, "drain_spool") as drain_mock:
+        agent.spool_uploader(stop)
+    drain_mock.assert_called_once_with(agent.TERMINATE_NET_TIMEOUT)
+
+
+def test_spool_drain_with_liveserver(tmpworkdir, live_server, apikey_agent, dummy_target):  # pylint: disable=unused-argument
+    """test agent uploads outputs spooled by previous run"""
+
+    queue_name = db.session.get(Queue, dummy_target.queue_id).name
+    assignment = SchedulerService.job_assign(queue_name, [])
+    Path("output.zip").write_bytes(b"dummy")
+    OutputSpool("spool", 0).put(assignment["id"], 0, "output.zip")
+
+    result = agent_main(["--server", url_for("frontend.index_route", _external=True), "--apikey", apikey_agent, "--queue", queue_name, "--oneshot"])
+    assert result == 0
+
+    db.session.expire_all()
+    job = db.session.get(Job, assignment["id"])
+    assert job.retval == 0
+    assert Path(job.output_abspath).read_bytes() == b"dummy"
+    assert not list(Path("spool").glob("*.zip"))
+
+
+def test_module_execute_many(tmpworkdir):  # pylint: disable=unused-argument
+    """test module bounded-parallel command execution"""
+
+    class TestModule(ModuleBase):
+        """test module"""
+
+        def run(self, assignment):
+            """run"""
+
+        def terminate(self):
+            """terminate"""
+
+    jobs = [(["sh", "-c", f"echo job{idx}; exit {idx}"], f"output-{idx}") for idx in range(4)]
+    module = TestModule()
+
+    assert module._execute_many(jobs, workers=2, delay=0.01) == [0, 1, 2, 3]  # pylint: disable=protected-access
+    assert Path("output-3").read_text(encoding="utf-8") == "job3\n"
+    assert not module.processes
+
+    # process started while terminate was requested is terminated right after registration
+    module.terminating = True
+    assert module._execute(["sleep", "10"]) == -signal.SIGTERM  # pylint: disable=protected-access
+    assert not module.processes
@@ -6,6 +6,7 @@ agents process handling
 import json
 import multiprocessing
 import os
+import re
 from http import HTTPStatus
 from time import sleep
 from uuid import uuid4
@@ -73,7 +74,7 @@ class SimpleServer:
         self.server = server
         self.url = self.server.url_for("/")[:-1]
         self.server.expect_request("/api/v2/scheduler/job/assign").respond_with_handler(self.handler_assign)
-        self.server.expect_request("/api/v2/scheduler/job/output").respond_with_handler(self.handler_output)
+        self.server.expect_request(re.compile(r"^/api/v3/scheduler/job/[a-f0-9\-]+/output$")).respond_with_handler(self.handler_output)
 
     @staticmethod
     def handler_assign(request):
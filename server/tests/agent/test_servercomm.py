@@ -5,6 +5,7 @@ tests with various server communication test cases
 
 import multiprocessing
 import os
+import re
 import signal
 from contextlib import contextmanager
 from http import HTTPStatus
@@ -15,6 +16,7 @@ from uuid import uuid4
 from flask import url_for
 
 import sner.agent.core
+from sner.agent.core import ServerableAgent
 from sner.agent.core import main as agent_main
 from tests.agent import xjsonify
 
@@ -46,7 +48,7 @@ class FailServer:
         self.cnt_assign = 0
         self.cnt_output = 0
         self.server.expect_request("/api/v2/scheduler/job/assign").respond_with_handler(self.handler_assign)
-        self.server.expect_request("/api/v2/scheduler/job/output").respond_with_handler(self.handler_output)
+        self.server.expect_request(re.compile(r"^/api/v3/scheduler/job/[a-f0-9\-]+/output$")).respond_with_handler(self.handler_output)
 
     def handler_assign(self, request):
         """handle assign request"""
@@ -61,6 +63,8 @@ class FailServer:
         """handle output request"""
         if request.headers.get("X-API-KEY") != "dummy":
             return xjsonify({"message": "unauthorized"})
+        if request.method == "GET":
+            return xjsonify({"offset": 0})
         if self.cnt_output < 2:
             self.cnt_output += 1
             return xjsonify({"message": "invalid request"}), HTTPStatus.BAD_REQUEST
@@ -79,7 +83,8 @@ def test_fail_server_communication(tmpworkdir, httpserver):  # pylint: disable=u
 
     # backoff_time is configurable via config, but since test is running in
     # tempdir is easier to patch the module instead of mocking config
-    with patch.dict(sner.agent.core.DEFAULT_CONFIG, {"BACKOFF_TIME": 0.1}):
+    # spool limit forces agent to wait for each upload
+    with patch.dict(sner.agent.core.DEFAULT_CONFIG, {"BACKOFF_TIME": 0.1, "SPOOL_MAX_SIZE": 1}):
         with terminate_after(1):
             agent_main(["--server", sserver.url, "--apikey", "dummy", "--debug"])
 
@@ -87,6 +92,34 @@ def test_fail_server_communication(tmpworkdir, httpserver):  # pylint: disable=u
     assert sserver.cnt_output > 1
 
 
+def test_prefetch_server_communication(tmpworkdir, httpserver):  # pylint: disable=unused-argument,redefined-outer-name
+    """tests pipelined agent prefetching next assignment"""
+
+    sserver = FailServer(httpserver)
+
+    with patch.dict(sner.agent.core.DEFAULT_CONFIG, {"BACKOFF_TIME": 0.1, "PREFETCH": True}):
+        with patch.object(ServerableAgent, "prefetch_assignment", autospec=True, side_effect=ServerableAgent.prefetch_assignment) as prefetch_mock:
+            with terminate_after(1):
+                agent_main(["--server", sserver.url, "--apikey", "dummy", "--debug"])
+
+    assert prefetch_mock.call_count > 1
+    assert sserver.cnt_output > 1
+
+
+def test_pool_server_communication(tmpworkdir, httpserver):  # pylint: disable=unused-argument,redefined-outer-name
+    """tests worker pool agent communication and terminate handling"""
+
+    sserver = FailServer(httpserver)
+
+    # spawned workers need a while to start
+    with patch.dict(sner.agent.core.DEFAULT_CONFIG, {"BACKOFF_TIME": 0.1, "SPOOL_MAX_SIZE": 1}):
+        with terminate_after(4):
+            agent_main(["--server", sserver.url, "--apikey", "dummy", "--debug", "--workers", "2"])
+
+    assert sserver.cnt_assign > 1
+    assert sserver.cnt_output > 1
+
+
 def test_empty_server_communication(tmpworkdir, live_server, apikey_agent):  # pylint: disable=unused-argument,redefined-outer-name
     """tests oneshot vs wait on assignment on empty server"""
 
@@ -105,8 +138,23 @@ def test_empty_server_communication(tmpworkdir, live_server, apikey_agent):  # p
     assert not proc_agent.is_alive()
 
 
+def test_empty_server_pool_oneshot(tmpworkdir, live_server, apikey_agent):  # pylint: disable=unused-argument,redefined-outer-name
+    """tests oneshot worker pool on empty server"""
+
+    result = agent_main(["--server", url_for("frontend.index_route", _external=True), "--apikey", apikey_agent, "--oneshot", "--workers", "2"])
+    assert result == 0
+
+
 def test_invalid_server_oneshot(tmpworkdir):  # pylint: disable=unused-argument,redefined-outer-name
     """test to raise exception in oneshot"""
 
     result = agent_main(["--server", "http://localhost:0", "--debug", "--oneshot"])
     assert result == 1
+
+
+def test_invalid_server_requests(tmpworkdir):  # pylint: disable=unused-argument,redefined-outer-name
+    """test non-blocking requests error handling"""
+
+    agent = ServerableAgent({**sner.agent.core.DEFAULT_CONFIG, "SERVER": "http://localhost:0"})
+    assert agent.prefetch_assignment() is None
+    assert agent.get_output_offset(agent.upload_output_url.format(id=uuid4())) == 0
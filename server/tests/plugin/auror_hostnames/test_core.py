@@ -3,23 +3,27 @@
 auror_hostnames plugin core tests
 """
 
-from pathlib import Path
+import shutil
+import subprocess
 from unittest.mock import call, patch
 
 import dns.zone
 import pytest
 
 from sner.plugin.auror_hostnames.core import (
+    ZoneCache,
     check_git_key_path,
     check_if_hostname,
-    clone_dns_repos,
     create_fqdn,
     get_records,
     get_repos,
-    get_zone_file_paths,
+    get_zone_blobs,
+    parse_zone_files,
     process_cnames,
     process_ptrs,
     resolve_hostname,
+    resolve_hostnames,
+    sync_dns_repos,
 )
 
 dummy_repos = ["dummy_repo1", "dummy_repo2", "dummy_repo3"]
@@ -42,32 +46,39 @@ def test_get_repos():
     assert result == dummy_repos
 
 
-def test_clone_dns_repos():
-    """Test cloning DNS repo"""
+def test_sync_dns_repos(tmp_path):
+    """Test cloning and updating DNS repos mirror"""
     dummy_git_server = "dummy_git_server"
+    (tmp_path / "dummy_repo1/.git").mkdir(parents=True)
 
     # Mock the subprocess.run to simulate cloning
     with patch("subprocess.run") as mock_run:
-        clone_dns_repos(dummy_git_server, dummy_repos, key)
+        sync_dns_repos(dummy_git_server, dummy_repos, key, tmp_path)
 
         # Check if subprocess.run was called with the correct arguments
-        expected_calls = [call(["git", "clone", f"git@{dummy_git_server}:{repo}", f"{dns_zones_folder}/{repo}"]) for repo in dummy_repos]
+        repo1_path = str(tmp_path / "dummy_repo1")
+        expected_calls = [
+            call(["git", "-C", repo1_path, "fetch", "--quiet", "origin"]),
+            call(["git", "-C", repo1_path, "reset", "--quiet", "--hard", "FETCH_HEAD"]),
+        ] + [call(["git", "clone", f"git@{dummy_git_server}:{repo}", str(tmp_path / repo)]) for repo in dummy_repos[1:]]
         actual_calls = [call(*args) for args, _ in mock_run.call_args_list]
         assert actual_calls == expected_calls
 
 
-def test_get_zone_file_paths():
-    """Test getting zone file paths"""
+def test_get_zone_blobs(tmp_path):
+    """Test getting zone files and blob hashes from mirrored repos"""
 
-    with patch("sner.plugin.auror_hostnames.core.Path", return_value=Path(f"{test_files_path}/{dns_zones_folder}")):
-        result = get_zone_file_paths()
+    repo_path = tmp_path / "dummy_repo1"
+    (repo_path / "zones").mkdir(parents=True)
+    shutil.copy(zone_file_path1, repo_path / "zones")
+    (repo_path / "README").write_text("dummy", encoding="utf-8")
+    subprocess.run(["git", "init", "--quiet", str(repo_path)], check=True)
+    subprocess.run(["git", "-C", str(repo_path), "add", "."], check=True)
+    blob = subprocess.check_output(["git", "hash-object", zone_file_path1], text=True).strip()
 
-    expected_result = {
-        f"{test_files_path}/{dns_zones_folder}/dummy_repo1/zones/example.com.zone",
-        f"{test_files_path}/{dns_zones_folder}/dummy_repo2/zones/1.168.192.in-addr.arpa.zone",
-        f"{test_files_path}/{dns_zones_folder}/dummy_repo3/zones/8.b.d.0.1.0.0.2.ip6.arpa.zone",
-    }
-    assert result == expected_result
+    result = get_zone_blobs(tmp_path, ["dummy_repo1"])
+
+    assert result == {str(repo_path / "zones/example.com.zone"): blob}
 
 
 def test_process_cnames():
@@ -111,6 +122,17 @@ def test_resolve_hostname():
         assert result == []
 
 
+def test_resolve_hostnames():
+    """Test concurrent resolving of hostnames"""
+
+    with patch("sner.plugin.auror_hostnames.core.resolve_hostname") as mock_resolve_hostname:
+        mock_resolve_hostname.side_effect = lambda hostname: {"host1": ["1.1.1.1"]}.get(hostname, [])
+        result = resolve_hostnames(["host1", "host2", "host1"], workers=2)
+
+    assert result == {"host1": ["1.1.1.1"], "host2": []}
+    assert mock_resolve_hostname.call_count == 2
+
+
 def test_process_ptrs():
     """Test processing PTRs"""
     ptrs = {
@@ -203,3 +225,43 @@ def test_get_records():
 
     assert result1 == expected_result1
     assert result2 == expected_result2
+
+
+def test_parse_zone_files():
+    """Test parsing zone files in process pool"""
+
+    result = parse_zone_files([zone_file_path1, zone_file_path2], workers=2)
+
+    assert result[0] == {"alias.example.com": "www.example.com"}
+    assert result[1]["www.example.com"] == {"2001:db8::3", "192.168.1.3"}
+    assert result[2]["3.1.168.192.in-addr.arpa"] == "www.example.com."
+    assert result[3]["192.168.1.1"] == {"ns1.example.com"}
+
+
+def test_parse_zone_files_cache(tmp_path):
+    """Test parsing zone files with parsed records cache"""
+
+    zone_blobs = {zone_file_path1: "blob1", zone_file_path2: "blob2"}
+
+    result = parse_zone_files(zone_blobs, workers=2, cache=ZoneCache(tmp_path, zone_blobs))
+
+    with patch("sner.plugin.auror_hostnames.core.get_records", side_effect=RuntimeError):
+        cached_result = parse_zone_files(zone_blobs, workers=2, cache=ZoneCache(tmp_path, zone_blobs))
+    assert cached_result == result
+
+    cache = ZoneCache(tmp_path, {zone_file_path1: "blob1"})
+    cache.prune()
+    assert [path.name for path in tmp_path.glob("*.json")] == ["blob1-example.com.zone.json"]
+    assert cache.get(zone_file_path1) == get_records(zone_file_path1)
+
+
+def test_zone_cache_include(tmp_path):
+    """Test zone files with $INCLUDE are not cached"""
+
+    zone_path = tmp_path / "include.zone"
+    zone_path.write_text(f"$ORIGIN example.com.\n$INCLUDE {zone_file_path1}\n", encoding="utf-8")
+    cache = ZoneCache(tmp_path / "cache", {str(zone_path): "blob1"})
+
+    cache.put(str(zone_path), [{}, {}, {}, {}])
+    assert not list((tmp_path / "cache").glob("*.json"))
+    assert cache.get(str(zone_path)) is None
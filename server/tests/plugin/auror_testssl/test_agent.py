@@ -4,7 +4,10 @@ auror_testssl plugin agent tests
 """
 
 import json
+import os
 import ssl
+import subprocess
+from time import sleep
 from uuid import uuid4
 
 import pytest
@@ -71,3 +74,22 @@ def test_filter_exit_codes():
     assert agent._filter_exit_codes(245) == 0
     assert agent._filter_exit_codes(246) == 0
     assert agent._filter_exit_codes(250) == 250
+
+
+def test_wait_children():
+    """Test reaping children does not steal exit status of running commands."""
+
+    agent = AgentModule()
+
+    process = subprocess.Popen(["sh", "-c", "exit 3"])  # pylint: disable=consider-using-with
+    agent.processes.add(process)
+    sleep(0.5)
+    agent._wait_children()
+    assert process.wait() == 3
+
+    agent.processes.clear()
+    leaked = subprocess.Popen(["true"])  # pylint: disable=consider-using-with
+    sleep(0.5)
+    agent._wait_children()
+    with pytest.raises(ChildProcessError):
+        os.waitpid(leaked.pid, os.WNOHANG)
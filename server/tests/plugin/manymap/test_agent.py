@@ -5,9 +5,12 @@ manymap plugin agent tests
 
 import json
 from uuid import uuid4
+from zipfile import ZipFile
 
 from sner.agent.core import main as agent_main
 from sner.lib import file_from_zip
+from sner.plugin.manymap.agent import AgentModule
+from sner.targets import ServiceTarget
 
 
 def test_basic(tmpworkdir):  # pylint: disable=unused-argument
@@ -23,3 +26,29 @@ def test_basic(tmpworkdir):  # pylint: disable=unused-argument
     assert result == 0
     assert "Host: 127.0.0.1 (localhost)" in file_from_zip("%s.zip" % test_a["id"], "output-1.gnmap").decode("utf-8")
     assert "# Nmap done at" in file_from_zip("%s.zip" % test_a["id"], "output-2.gnmap").decode("utf-8")
+
+
+def test_batch(tmpworkdir):  # pylint: disable=unused-argument
+    """manymap module host-grouped batch execution test"""
+
+    test_a = {
+        "id": str(uuid4()),
+        "config": {"module": "manymap", "args": ["-sV"], "batch": True},
+        "targets": ["svc,127.0.0.1,proto=tcp,port=1", "svc,::1,proto=tcp,port=2", "svc,127.0.0.1,proto=tcp,port=3"],
+    }
+
+    result = agent_main(["--assignment", json.dumps(test_a), "--debug"])
+    assert result == 0
+    output = file_from_zip(f"{test_a['id']}.zip", "output-0.xml").decode("utf-8")
+    assert 'portid="1"' in output
+    assert 'portid="3"' in output
+    assert "# Nmap done at" in file_from_zip(f"{test_a['id']}.zip", "output-1.gnmap").decode("utf-8")
+    with ZipFile(f"{test_a['id']}.zip") as ftmp:
+        assert "output-2.xml" not in ftmp.namelist()
+
+
+def test_ports_spec():
+    """test nmap port list generator"""
+
+    targets = [ServiceTarget("127.0.0.1", "udp", 53), ServiceTarget("127.0.0.1", "tcp", 80), ServiceTarget("127.0.0.1", "tcp", 22)]
+    assert AgentModule.ports_spec(targets) == "T:80,22,U:53"
@@ -30,3 +30,13 @@ def test_parse_path():
     assert [x.port for x in pidb.services] == expected_services
     assert len(list(filter(lambda x: x.xtype == "cpe", pidb.notes))) == 5
     assert len(list(filter(lambda x: x.xtype == "nmap.banner_dict", pidb.notes))) == 4
+
+
+def test_parse_path_invalid(tmpworkdir):  # pylint: disable=unused-argument
+    """check if parser raises exception on invalid input"""
+
+    with open("output.xml", "w", encoding="utf-8") as ftmp:
+        ftmp.write('<?xml version="1.0"?><nmaprun><host>')
+
+    with pytest.raises(NmapParserException):
+        ParserModule.parse_path("output.xml")
@@ -3,7 +3,12 @@
 nuclei output parser tests
 """
 
+import json
+from pathlib import Path
+from zipfile import ZipFile
+
 from sner.plugin.nuclei.parser import ParserModule
+from sner.server.utils import SnerJSONEncoder
 
 
 def test_parse_path():
@@ -25,6 +30,25 @@ def test_parse_path():
     assert "CVE-2023-9999" in pidb.vulns.where(xtype="nuclei.dvwa-default-login")[0].refs
 
 
+def test_parse_path_jsonl(tmp_path):
+    """check jsonl parsing, plain and from agent output"""
+
+    expected_vulns = ["nuclei.phpinfo-files", "nuclei.dvwa-default-login", "nuclei.git-config"]
+    reports = json.loads(Path("tests/server/data/parser-nuclei.json").read_text(encoding="utf-8"))
+    jsonl_path = tmp_path / "output.jsonl"
+    # duplicate lines are parsed only once
+    jsonl_path.write_text("".join(f"{json.dumps(report)}\n" for report in reports + reports[:1]), encoding="utf-8")
+
+    pidb = ParserModule.parse_path(str(jsonl_path))
+    assert [x.xtype for x in pidb.vulns] == expected_vulns
+
+    with ZipFile(tmp_path / "output.zip", "w") as fzip:
+        fzip.write(jsonl_path, "output.jsonl")
+    pidb = ParserModule.parse_path(str(tmp_path / "output.zip"))
+    assert [x.xtype for x in pidb.vulns] == expected_vulns
+    assert pidb.vulns[0].data == json.dumps(reports[0], cls=SnerJSONEncoder)
+
+
 def test_parse_agent_output():
     """check agent output parsing"""
 
@@ -4,10 +4,14 @@ six_dns_discover plugin agent test
 """
 
 import json
+from time import sleep
 from uuid import uuid4
 
+import pytest
+
 from sner.agent.core import main as agent_main
 from sner.lib import file_from_zip
+from sner.plugin.six_dns_discover import agent as module_agent
 
 
 def test_basic(tmpworkdir):  # pylint: disable=unused-argument
@@ -18,3 +22,55 @@ def test_basic(tmpworkdir):  # pylint: disable=unused-argument
     result = agent_main(["--assignment", json.dumps(test_a), "--debug"])
     assert result == 0
     assert "::1" in json.loads(file_from_zip(f"{test_a['id']}.zip", "output.json").decode("utf-8"))
+
+
+def test_concurrent(tmpworkdir, monkeypatch):  # pylint: disable=unused-argument
+    """six_dns_discover concurrent resolution test against stub resolver"""
+
+    ptr_records = {"192.0.2.1": "host1.example.com", "192.0.2.2": "host1.example.com", "192.0.2.3": "host3.example.com"}
+    aaaa_records = {"host1.example.com": ["2001:db8::1"]}
+    lookups = []
+
+    def stub_gethostbyaddr(address):
+        lookups.append(address)
+        # overlap concurrent lookups of the same address
+        sleep(0.1)
+        if address not in ptr_records:
+            raise OSError("not found")
+        return ptr_records[address], [], [address]
+
+    def stub_getaddrinfo(hostname, *args):  # pylint: disable=unused-argument
+        lookups.append(hostname)
+        if hostname not in aaaa_records:
+            raise OSError("not found")
+        return [(None, None, None, "", (addr, 0, 0, 0)) for addr in aaaa_records[hostname]]
+
+    monkeypatch.setattr(module_agent, "gethostbyaddr", stub_gethostbyaddr)
+    monkeypatch.setattr(module_agent, "getaddrinfo", stub_getaddrinfo)
+
+    test_a = {
+        "id": str(uuid4()),
+        "config": {"module": "six_dns_discover", "delay": 0, "workers": 4},
+        "targets": ["host,192.0.2.1", "host,192.0.2.2", "host,192.0.2.3", "host,192.0.2.4", "host,192.0.2.1"],
+    }
+
+    result = agent_main(["--assignment", json.dumps(test_a), "--debug"])
+    assert result == 0
+    output = json.loads(file_from_zip(f"{test_a['id']}.zip", "output.json").decode("utf-8"))
+    assert output == {"2001:db8::1": ["host1.example.com", "192.0.2.2"]}
+    assert lookups.count("192.0.2.1") == 1
+    assert lookups.count("host1.example.com") == 1
+
+
+def test_cached_exception():
+    """six_dns_discover cache propagates unexpected resolver errors to all lookups of the key"""
+
+    module = module_agent.AgentModule()
+
+    def failing(_key):
+        raise ValueError("unexpected")
+
+    with pytest.raises(ValueError):
+        module._cached(module.ptr_cache, failing, "192.0.2.1")  # pylint: disable=protected-access
+    with pytest.raises(ValueError):
+        module._cached(module.ptr_cache, failing, "192.0.2.1")  # pylint: disable=protected-access
@@ -7,6 +7,7 @@ import base64
 import json
 from datetime import datetime
 from http import HTTPStatus
+from io import BytesIO
 from ipaddress import ip_network
 from pathlib import Path
 from unittest.mock import patch
@@ -17,7 +18,7 @@ from sqlalchemy import create_engine, func, select
 import sner.server.api.schema as api_schema
 import sner.server.api.views
 from sner.server.extensions import db
-from sner.server.scheduler.core import SCHEDULER_LOCK_NUMBER, SchedulerService
+from sner.server.scheduler.core import SCHEDULER_JOB_LOCK_NAMESPACE, SCHEDULER_LOCK_NUMBER, JobManager, SchedulerService
 from sner.server.scheduler.models import Heatmap, Job, Queue, Readynet, Target
 
 
@@ -38,6 +39,23 @@ def test_v2_scheduler_job_assign_route(api_agent, target):
     assert not response.json
 
 
+def test_v2_scheduler_job_assign_route_wait(api_agent, queue, target_factory):
+    """job assign route long-poll test"""
+
+    current_app.config["SNER_ASSIGN_WAIT_MAX"] = 0.1
+    response = api_agent.post_json(url_for("api.v2_scheduler_job_assign_route"), {"queue": queue.name, "wait": 10})
+    assert response.status_code == HTTPStatus.OK
+    assert not response.json
+
+    target_factory.create(queue=queue)
+    response = api_agent.post_json(url_for("api.v2_scheduler_job_assign_route"), {"queue": queue.name, "wait": 10})
+    assert response.status_code == HTTPStatus.OK
+    assert response.json
+
+    response = api_agent.post_json(url_for("api.v2_scheduler_job_assign_route"), {"queue": queue.name, "wait": -1}, status="*")
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
 def test_v2_scheduler_job_assign_route_unauthenticated(client):
     """job assign route test"""
 
@@ -120,6 +138,18 @@ def test_v2_scheduler_job_output_route(api_agent, job):
     assert job.retval == 12345
     assert Path(job.output_abspath).read_text(encoding="utf-8") == "a-test-file-contents"
 
+    # duplicate request passed the running job check before the first one finished the job
+    with patch.object(sner.server.api.views, "_running_job", return_value=job):
+        response = api_agent.post_json(
+            url_for("api.v2_scheduler_job_output_route"),
+            {"id": job.id, "retval": 1, "output": base64.b64encode(b"duplicate").decode("utf-8")},
+        )
+    assert response.json["message"] == "discard job"
+    assert job.retval == 12345
+    assert Path(job.output_abspath).read_text(encoding="utf-8") == "a-test-file-contents"
+    # request staging files are cleaned up
+    assert [item.name for item in Path(job.output_abspath).parent.iterdir()] == [job.id]
+
 
 def test_v2_scheduler_job_output_route_invalidrequest(api_agent):
     """job output route test invalid and discarded requests"""
@@ -158,6 +188,102 @@ def test_v2_scheduler_job_output_route_locked(api_agent, job):
     assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
 
 
+def test_v3_scheduler_job_output_route(api_agent, job):
+    """job output streaming route test"""
+
+    url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=0, offset=0)
+    response = api_agent.get(url_for("api.v3_scheduler_job_output_offset_route", job_id=job.id))
+    assert response.json["offset"] == 0
+
+    # interrupted upload
+    JobManager.write_output_stream(job, BytesIO(b"a-test-"))
+    response = api_agent.get(url_for("api.v3_scheduler_job_output_offset_route", job_id=job.id))
+    assert response.json["offset"] == 7
+
+    # resume upload from invalid offset
+    url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=0, offset=10)
+    response = api_agent.post(url, b"file-contents", content_type="application/octet-stream", status="*")
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert response.json["offset"] == 7
+
+    url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=0, offset=7)
+    response = api_agent.post(url, b"file-contents", content_type="application/octet-stream")
+    assert response.status_code == HTTPStatus.OK
+    assert job.retval == 0
+    assert Path(job.output_abspath).read_text(encoding="utf-8") == "a-test-file-contents"
+    assert not Path(job.output_partpath).exists()
+
+    # repeated requests are discarded
+    response = api_agent.post(url, b"file-contents", content_type="application/octet-stream")
+    assert response.json["message"] == "discard job"
+    response = api_agent.get(url_for("api.v3_scheduler_job_output_offset_route", job_id=job.id))
+    assert response.json["message"] == "discard job"
+
+
+def test_v3_scheduler_job_output_route_duplicate(api_agent, job):
+    """job output streaming route test duplicate finish"""
+
+    url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=0, offset=0)
+    response = api_agent.post(url, b"a-test-file-contents", content_type="application/octet-stream")
+    assert response.json["message"] == "success"
+
+    # duplicate request passed the running job check before the first one finished the job
+    with patch.object(sner.server.api.views, "_running_job", return_value=job):
+        url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=1, offset=0)
+        response = api_agent.post(url, b"duplicate", content_type="application/octet-stream")
+    assert response.json["message"] == "discard job"
+
+    assert job.retval == 0
+    assert Path(job.output_abspath).read_text(encoding="utf-8") == "a-test-file-contents"
+    assert not Path(job.output_partpath).exists()
+    assert SchedulerService.heatmap_check()
+
+
+def test_v3_scheduler_job_output_route_joblocked(api_agent, job):
+    """job output streaming route test job locked by concurrent repeated request"""
+
+    url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=0, offset=0)
+    db.session.commit()
+    with create_engine(current_app.config["SQLALCHEMY_DATABASE_URI"]).connect() as conn:
+        conn.execute(select(func.pg_advisory_lock(SCHEDULER_JOB_LOCK_NAMESPACE, func.hashtext(job.id))))
+
+        with patch.object(sner.server.scheduler.core.SchedulerService, "TIMEOUT_JOB_OUTPUT", 1):
+            response = api_agent.post(url, b"a-test-file-contents", content_type="application/octet-stream", status="*")
+
+        conn.execute(select(func.pg_advisory_unlock(SCHEDULER_JOB_LOCK_NAMESPACE, func.hashtext(job.id))))
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert not Path(job.output_partpath).exists()
+
+    response = api_agent.post(url, b"a-test-file-contents", content_type="application/octet-stream")
+    assert response.json["message"] == "success"
+
+
+def test_v3_scheduler_job_output_route_locked(api_agent, job):
+    """job output streaming route test locked"""
+
+    url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=0, offset=0)
+    db.session.commit()
+    with create_engine(current_app.config["SQLALCHEMY_DATABASE_URI"]).connect() as conn:
+        conn.execute(select(func.pg_advisory_lock(SCHEDULER_LOCK_NUMBER)))
+
+        with patch.object(sner.server.scheduler.core.SchedulerService, "TIMEOUT_JOB_OUTPUT", 1):
+            response = api_agent.post(url, b"a-test-file-contents", content_type="application/octet-stream", status="*")
+
+        conn.execute(select(func.pg_advisory_unlock(SCHEDULER_LOCK_NUMBER)))
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert job.retval is None
+
+    # staged output is kept, agent can finish upload with empty body
+    response = api_agent.get(url_for("api.v3_scheduler_job_output_offset_route", job_id=job.id))
+    assert response.json["offset"] == 20
+    url = url_for("api.v3_scheduler_job_output_route", job_id=job.id, retval=0, offset=20)
+    response = api_agent.post(url, b"", content_type="application/octet-stream")
+    assert response.status_code == HTTPStatus.OK
+    assert Path(job.output_abspath).read_text(encoding="utf-8") == "a-test-file-contents"
+
+
 def test_v2_scheduler_job_lifecycle_with_heatmap(api_agent, queue, target_factory):
     """job assign route test"""
 
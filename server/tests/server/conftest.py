@@ -111,6 +111,12 @@ class TestAppApi(TestApp):
         kwargs["headers"] = {"X-API-KEY": self.apikey}
         return super().get(*args, **kwargs)
 
+    def post(self, *args, **kwargs):
+        """authenticated post"""
+
+        kwargs["headers"] = {"X-API-KEY": self.apikey}
+        return super().post(*args, **kwargs)
+
     def post_json(self, *args, **kwargs):
         """authenticated post_json"""
 
@@ -4,6 +4,8 @@ planner stages tests
 """
 
 from collections import namedtuple
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
 from unittest.mock import patch
 
 import pytest
@@ -26,6 +28,7 @@ from sner.server.planner.stages import (
     StorageCleanup,
     StorageLoader,
 )
+from sner.server.scheduler.models import Job
 from sner.server.storage.models import Host, Note, Service, Vuln
 from sner.server.utils import yaml_dump
 from sner.targets import GenericTarget, HostTarget, TargetManager
@@ -92,7 +95,7 @@ def test_netlist(app):  # pylint: disable=unused-argument
     stage.run()
 
     assert dummy.task_count == 1
-    assert dummy.task_args == TargetManager.from_list(["host,127.0.0.0", "host,127.0.0.1"])
+    assert dummy.task_args == TargetManager.from_list(["range,127.0.0.0-127.0.0.1"])
 
 
 def test_hosttarget_processing(app, queue_factory, job_completed_factory):  # pylint: disable=unused-argument
@@ -107,7 +110,7 @@ def test_hosttarget_processing(app, queue_factory, job_completed_factory):  # py
     stage = Netlist("netlist", schedule="0s", netlist=["127.0.0.0/31"], next_stages=[loader])
     stage.run()
 
-    assert len(queue.targets) == 2
+    assert [item.target for item in queue.targets] == ["range,127.0.0.0-127.0.0.1"]
 
 
 def test_servicediscostorageloader(app, queue):  # pylint: disable=unused-argument
@@ -234,8 +237,8 @@ def test_queuehandler(app, queue):  # pylint: disable=unused-argument
     stage.task([target])
     assert len(queue.targets) == 1
 
-    stage.task([target])
-    assert len(queue.targets) == 1
+    stage.task([target, GenericTarget("dummy2"), GenericTarget("dummy2")])
+    assert sorted(item.target for item in queue.targets) == ["dummy", "dummy2"]
 
 
 def test_queuehandler_nxqueue(app):  # pylint: disable=unused-argument
@@ -380,3 +383,48 @@ def test_nessusscan_loader(app, queue_factory, job_completed_factory, host_facto
     assert Vuln.query.filter_by(xtype="nessus.14272").count() == 1
     assert Vuln.query.filter_by(xtype="nessus.45590").count() == 1
     assert Vuln.query.filter_by(xtype="nessus.delete_dummy").count() == 0
+
+
+def test_storageloader_parse_workers(app, queue_factory, job_completed_factory):  # pylint: disable=unused-argument
+    """test StorageLoader planner stage with jobs parsed in process pool"""
+
+    app.config["SNER_PLANNER_PARSE_WORKERS"] = 2
+    queue = queue_factory.create(name="test queue", config=yaml_dump({"module": "dummy"}))
+    valid, invalid = "tests/server/data/parser-dummy-job.zip", "tests/server/data/parser-dummy-job-invalidjson.zip"
+    job_ids = [job_completed_factory.create(queue=queue, make_output=output).id for output in [valid, invalid, valid]]
+
+    pidbs = list(StorageLoader(name="dummy", queue_name=queue.name)._drain())  # pylint: disable=protected-access
+
+    assert len(pidbs) == 2
+    assert pidbs[0].hosts
+    assert [(job.id, job.retval) for job in Job.query.all()] == [(job_ids[1], 1000)]
+
+
+def test_storageloader_parse_workers_broken_pool(app, queue_factory, job_completed_factory):  # pylint: disable=unused-argument
+    """test StorageLoader planner stage falls back to in-process parsing when process pool breaks"""
+
+    class BrokenExecutor:
+        """executor with crashed worker process"""
+
+        def __init__(self, *args, **kwargs):
+            """init"""
+
+        def submit(self, *args, **kwargs):  # pylint: disable=unused-argument
+            """submit"""
+            future = Future()
+            future.set_exception(BrokenProcessPool("worker died"))
+            return future
+
+        def shutdown(self, **kwargs):
+            """shutdown"""
+
+    app.config["SNER_PLANNER_PARSE_WORKERS"] = 2
+    queue = queue_factory.create(name="test queue", config=yaml_dump({"module": "dummy"}))
+    valid, invalid = "tests/server/data/parser-dummy-job.zip", "tests/server/data/parser-dummy-job-invalidjson.zip"
+    job_ids = [job_completed_factory.create(queue=queue, make_output=output).id for output in [valid, invalid, valid]]
+
+    with patch("sner.server.planner.stages.ProcessPoolExecutor", BrokenExecutor):
+        pidbs = list(StorageLoader(name="dummy", queue_name=queue.name)._drain())  # pylint: disable=protected-access
+
+    assert len(pidbs) == 2
+    assert [(job.id, job.retval) for job in Job.query.all()] == [(job_ids[1], 1000)]
@@ -8,7 +8,7 @@ from pathlib import Path
 from sner.server.extensions import db
 from sner.server.scheduler.commands import command
 from sner.server.scheduler.core import SchedulerService
-from sner.server.scheduler.models import Job, Queue
+from sner.server.scheduler.models import Job, Prefetch, Queue, Readynet
 
 
 def test_enumips_command(runner, tmpworkdir):  # pylint: disable=unused-argument
@@ -89,11 +89,25 @@ def test_queue_prune_command(runner, job_completed):
     assert not Path(job_completed.output_abspath).exists()
 
 
-def test_readynet_recount_command(runner):
+def test_readynet_recount_command(runner, target):  # pylint: disable=unused-argument
     """test readynet_recount command"""
 
+    Readynet.query.delete()
+    db.session.commit()
+
     result = runner.invoke(command, ["readynet-recount"])
     assert result.exit_code == 0
+    assert "1 readynets added" in result.output
+    assert Readynet.query.count() == 1
+
+
+def test_prefetch_command(runner, target):  # pylint: disable=unused-argument
+    """test prefetch command"""
+
+    result = runner.invoke(command, ["prefetch", "--size", "1", "--oneshot"])
+    assert result.exit_code == 0
+    assert "1 assignments prefetched" in result.output
+    assert Prefetch.query.count() == 1
 
 
 def test_heatmap_check_command(runner, target):  # pylint: disable=unused-argument
@@ -3,22 +3,31 @@
 scheduler core tests
 """
 
+import json
 from ipaddress import ip_address, ip_network
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 import yaml
 from flask import current_app
+from sqlalchemy import create_engine, func, select
 
 from sner.server.dbx_command import QueuePrio
 from sner.server.extensions import db
 from sner.server.scheduler.core import (
+    SCHEDULER_QUEUE_LOCK_NAMESPACE,
+    CopyStream,
     ExclMatcher,
     QueueManager,
+    RandomTarget,
     SchedulerService,
+    SchedulerServiceBusyException,
+    WorkListener,
     enumerate_network,
 )
-from sner.server.scheduler.models import Heatmap, Job, Readynet
+from sner.server.scheduler.models import Heatmap, Job, Prefetch, Queue, Readynet, Target
+from sner.targets import HostTarget, RangeTarget, TargetManager
 
 
 def test_enumerate_network():
@@ -75,10 +84,49 @@ def test_excl_matcher(app):  # pylint: disable=unused-argument
     # test auror_testssl
     assert matcher.match("auror,127.66.66.2,port=11,hostname=hostname,enc=I")
 
+    # test range
+    assert matcher.match("range,127.66.66.60-127.66.66.70")
+    assert not matcher.match("range,127.66.66.64-127.66.66.70")
+
     for item in matcher.excls:
         repr(item)
 
 
+def test_excl_matcher_compiled(app):  # pylint: disable=unused-argument
+    """test compiled matcher caching, regex fallback and range trimming"""
+
+    config = [
+        ["regex", "(?i)^dummy$"],
+        ["regex", "notarget"],
+        ["network", "127.0.0.16/28"],
+        ["network", "127.0.0.24/29"],
+        ["network", "127.0.0.32/31"],
+    ]
+
+    matcher = ExclMatcher.from_config(config)
+    assert ExclMatcher.from_config(config) is matcher
+    assert ExclMatcher.from_config(config[:1]) is not matcher
+
+    assert matcher.match("DUMMY")
+    assert matcher.match("notarget")
+    assert not matcher.match("dummy1")
+
+    # patterns with capture groups are not combined, backreferences keep their numbering
+    groups_matcher = ExclMatcher.from_config([["regex", "^notarget$"], ["regex", r"^(a)(b)\2\1$"], ["regex", r"^(?P<x>c)(?P=x)$"]])
+    assert groups_matcher.match("abba")
+    assert groups_matcher.match("cc")
+    assert groups_matcher.match("notarget")
+    assert not groups_matcher.match("abab")
+
+    targets = [RangeTarget("127.0.0.0", "127.0.0.255"), RangeTarget("127.0.0.16", "127.0.0.33"), HostTarget("127.0.0.20"), HostTarget("127.0.0.1")]
+    assert [str(item) for item in matcher.filter(targets)] == [
+        "range,127.0.0.0-127.0.0.15",
+        "range,127.0.0.34-127.0.0.255",
+        "host,127.0.0.1",
+    ]
+    assert list(ExclMatcher.from_config([]).filter(targets[:1])) == targets[:1]
+
+
 def test_queuemanager_errorhandling(app, queue):  # pylint: disable=unused-argument
     """test QueuemaManger error handling"""
 
@@ -90,6 +138,30 @@ def test_queuemanager_errorhandling(app, queue):  # pylint: disable=unused-argum
     assert "failed to remove queue directory" in str(pytest_wrapped_e)
 
 
+def test_queuemanager_enqueue(app, queue):  # pylint: disable=unused-argument
+    """test QueueManager bulk enqueue streams targets including special characters"""
+
+    targets = ["127.0.0.1", "tab\tvalue", "back\\slash", "new\nline"]
+    QueueManager.enqueue(queue, (TargetManager.from_str(item) for item in targets))
+    QueueManager.enqueue(queue, iter([]))
+
+    assert sorted(item.target for item in Target.query.all()) == sorted(targets)
+    assert Readynet.query.count() == 4
+
+    # excluded targets never reach the queue
+    current_app.config["SNER_EXCLUSIONS"] = [["network", "127.0.1.0/30"], ["regex", "^excluded$"]]
+    assert QueueManager.enqueue(queue, TargetManager.from_list(["excluded", "host,127.0.1.1", "range,127.0.1.0-127.0.1.3"])) == 0
+
+
+def test_copystream():
+    """test CopyStream serialization and chunked reads"""
+
+    stream = CopyStream([("a", "b"), ("c\td", "e")])
+    assert stream.read(3) == b"a\tb"
+    assert stream.read() == b"\nc\\td\te\n"
+    assert stream.read(10) == b""
+
+
 def test_schedulerservice_hashval():
     """test heatmap hashval computation"""
 
@@ -150,6 +222,78 @@ def test_schedulerservice_morereadynetupdates(app, queue, target_factory):  # py
     assert Readynet.query.count() == 1
 
 
+def test_schedulerservice_batchedassign(app, queue, target_factory):  # pylint: disable=unused-argument
+    """test scheduler service batched target pop respects heatmap hot level"""
+
+    current_app.config["SNER_HEATMAP_HOT_LEVEL"] = 3
+    queue.group_size = 5
+
+    for addr in range(10):
+        tmp = f"127.0.0.{addr}"
+        target_factory.create(queue=queue, target=tmp, hashval=SchedulerService.hashval(tmp))
+    for addr in range(2):
+        tmp = f"127.0.1.{addr}"
+        target_factory.create(queue=queue, target=tmp, hashval=SchedulerService.hashval(tmp))
+    db.session.commit()
+
+    assignment = SchedulerService.job_assign(None, [])
+
+    assert len(assignment["targets"]) == 5
+    assert {item.hashval: item.count for item in Heatmap.query.all()} == {"127.0.0.0/24": 3, "127.0.1.0/24": 2}
+    assert Readynet.query.count() == 0
+    assert SchedulerService.heatmap_check()
+
+
+def test_schedulerservice_heatmappopmany(app, queue_factory, target_factory):  # pylint: disable=unused-argument
+    """test scheduler service bulk heatmap pop re-activates cooled readynets"""
+
+    current_app.config["SNER_HEATMAP_HOT_LEVEL"] = 2
+    queue1 = queue_factory.create(name="test1")
+    queue2 = queue_factory.create(name="test2")
+
+    SchedulerService.heatmap_put_many(["127.0.0.0/24"] * 3 + ["127.0.1.0/24"] * 2)
+    target_factory.create(queue=queue1, target="127.0.0.1", hashval="127.0.0.0/24")
+    target_factory.create(queue=queue2, target="127.0.0.2", hashval="127.0.0.0/24")
+    target_factory.create(queue=queue2, target="127.0.1.1", hashval="127.0.1.0/24")
+    assert Readynet.query.count() == 0
+
+    assert SchedulerService.heatmap_pop_many(["127.0.0.0/24", "127.0.1.0/24"]) == {"127.0.0.0/24": 2, "127.0.1.0/24": 1}
+    assert {(item.queue_id, item.hashval) for item in Readynet.query.all()} == {(queue2.id, "127.0.1.0/24")}
+
+    assert SchedulerService.heatmap_pop("127.0.0.0/24") == 1
+    assert Readynet.query.count() == 3
+    assert not SchedulerService.heatmap_pop_many([])
+
+
+def test_schedulerservice_rangeassign(app, queue):  # pylint: disable=unused-argument
+    """test scheduler service slices range targets respecting heatmap hot level"""
+
+    current_app.config["SNER_HEATMAP_HOT_LEVEL"] = 3
+    queue.group_size = 5
+    QueueManager.enqueue(queue, RangeTarget.from_network("127.0.0.0/23"))
+    assert Target.query.count() == 2
+
+    # exclusions changed after enqueue are still applied on sliced hosts
+    current_app.config["SNER_EXCLUSIONS"] = [["network", "127.0.0.1/32"]]
+
+    assignment = SchedulerService.job_assign(None, [])
+
+    assert len(assignment["targets"]) == 5
+    assert "host,127.0.0.1" not in assignment["targets"]
+    assert sorted(item.count for item in Heatmap.query.all()) == [2, 3]
+    assert Readynet.query.count() == 1
+    assert Target.query.count() == 2
+    assert SchedulerService.heatmap_check()
+
+    current_app.config["SNER_HEATMAP_HOT_LEVEL"] = 0
+    SchedulerService.readynet_recount()
+    queue.group_size = 1000
+    assignment = SchedulerService.job_assign(None, [])
+
+    assert len(assignment["targets"]) == 512 - 5 - 1
+    assert Target.query.count() == 0
+
+
 def test_schedulerservice_hashvalprocessing(app, queue, target_factory):  # pylint: disable=unused-argument
     """test scheduler service hashvalsreadynet manipulation"""
 
@@ -271,6 +415,127 @@ def test_schedulerservice_morecapsrouting(app, queue_factory, target_factory):
     assert assignment["targets"] == ["dummy3"]
 
 
+def test_schedulerservice_queuelocking(app, queue_factory, target_factory):  # pylint: disable=unused-argument
+    """test scheduler service queue lock does not block other queues"""
+
+    queue1 = queue_factory.create(name="test1")
+    queue2 = queue_factory.create(name="test2")
+    target_factory.create(queue=queue1, target="dummy1")
+    target_factory.create(queue=queue2, target="dummy2")
+
+    # flush current session and create new independent connection to simulate lock from other agent
+    db.session.commit()
+    with create_engine(current_app.config["SQLALCHEMY_DATABASE_URI"]).connect() as conn:
+        conn.execute(select(func.pg_advisory_lock(SCHEDULER_QUEUE_LOCK_NAMESPACE, queue1.id)))
+
+        with patch.object(SchedulerService, "TIMEOUT_JOB_ASSIGN", 1):
+            with pytest.raises(SchedulerServiceBusyException):
+                SchedulerService.job_assign("test1", [])
+            assignment = SchedulerService.job_assign("test2", [])
+
+        conn.execute(select(func.pg_advisory_unlock(SCHEDULER_QUEUE_LOCK_NAMESPACE, queue1.id)))
+
+    assert assignment["targets"] == ["dummy2"]
+    assert SchedulerService.job_assign("test1", [])["targets"] == ["dummy1"]
+
+
+def test_schedulerservice_accountoverheat(app, queue):  # pylint: disable=unused-argument
+    """test popped targets overheating readynet due to concurrent assignment are returned to queue"""
+
+    current_app.config["SNER_HEATMAP_HOT_LEVEL"] = 1
+    hashval = SchedulerService.hashval("127.0.0.1")
+    SchedulerService.heatmap_put(hashval)
+
+    assert not SchedulerService._account_targets(queue, [RandomTarget(None, "127.0.0.1", hashval)])  # pylint: disable=protected-access
+    assert Target.query.filter(Target.queue_id == queue.id).one().target == "127.0.0.1"
+    assert db.session.get(Heatmap, hashval).count == 1
+    assert Readynet.query.count() == 0
+
+
+def test_schedulerservice_worklistener(app, queue):  # pylint: disable=unused-argument
+    """test work notifications are delivered to listener on commit"""
+
+    with WorkListener() as listener:
+        assert not listener.wait(0)
+
+        SchedulerService.notify_work()
+        assert not listener.wait(0)
+        db.session.commit()
+        assert listener.wait(1)
+        assert not listener.wait(0)
+
+        QueueManager.enqueue(queue, [HostTarget("127.0.0.1")])
+        assert listener.wait(1)
+
+
+def test_schedulerservice_jobassignwait(app, queue, target_factory):  # pylint: disable=unused-argument
+    """test job assign waiting for work"""
+
+    assert not SchedulerService.job_assign_wait(queue.name, [], 0.1)
+
+    target_factory.create(queue=queue, target="dummy1")
+    assert SchedulerService.job_assign_wait(queue.name, [], 10)["targets"] == ["dummy1"]
+
+
+def test_schedulerservice_jobassignwait_waiterslimit(app, queue, target_factory):  # pylint: disable=unused-argument
+    """test job assign does not wait over waiters limit"""
+
+    current_app.config["SNER_ASSIGN_WAITERS_MAX"] = 0
+    with patch("sner.server.scheduler.core.WorkListener", side_effect=RuntimeError("no listener expected")):
+        assert not SchedulerService.job_assign_wait(queue.name, [], 10)
+
+        target_factory.create(queue=queue, target="dummy1")
+        assert SchedulerService.job_assign_wait(queue.name, [], 10)["targets"] == ["dummy1"]
+    assert SchedulerService._assign_waiters == 0  # pylint: disable=protected-access
+
+
+def test_schedulerservice_prefetch(app, queue_factory):  # pylint: disable=unused-argument
+    """test prefetch buffer fill, assignment and reclaim"""
+
+    current_app.config["SNER_HEATMAP_HOT_LEVEL"] = 1
+    queue = queue_factory.create(name="test", group_size=1)
+    QueueManager.enqueue(queue, [HostTarget("127.0.0.1"), HostTarget("127.0.1.1"), HostTarget("127.0.2.1")])
+
+    assert SchedulerService.prefetch_fill(2) == 2
+    assert Prefetch.query.count() == 2
+    assert Target.query.count() == 1
+    assert Heatmap.query.filter(Heatmap.count == 1).count() == 2
+    assert SchedulerService.heatmap_check()
+
+    # buffer is already full, assignment is served from buffer
+    assert SchedulerService.prefetch_fill(2) == 0
+    prefetched = json.loads(Prefetch.query.order_by(Prefetch.id).first().targets)
+    assignment = SchedulerService.job_assign(queue.name, [])
+    assert assignment["targets"] == prefetched
+    assert Prefetch.query.count() == 1
+    assert SchedulerService.heatmap_check()
+
+    # expired prefetch is returned to queue
+    assert SchedulerService.prefetch_reclaim(3600) == 0
+    assert SchedulerService.prefetch_reclaim(0) == 1
+    assert Prefetch.query.count() == 0
+    assert Target.query.count() == 2
+    assert Readynet.query.count() == 2
+    assert SchedulerService.heatmap_check()
+
+
+def test_schedulerservice_prefetchdrop(app, queue):  # pylint: disable=unused-argument
+    """test prefetched assignments are dropped with queue flush/delete"""
+
+    QueueManager.enqueue(queue, [HostTarget("127.0.0.1"), HostTarget("127.0.1.1")])
+
+    assert SchedulerService.prefetch_fill(1) == 1
+    QueueManager.flush(queue)
+    assert Prefetch.query.count() == 0
+    assert not Heatmap.query.filter(Heatmap.count != 0).all()
+
+    QueueManager.enqueue(queue, [HostTarget("127.0.0.1")])
+    assert SchedulerService.prefetch_fill(1) == 1
+    QueueManager.delete(queue)
+    assert Queue.query.count() == 0
+    assert not Heatmap.query.filter(Heatmap.count != 0).all()
+
+
 def test_schedulerservice_repeatfailedjobs(app, queue, job_factory):  # pylint: disable=unused-argument
     """test scheduler service repeat_failed_jobs"""
 
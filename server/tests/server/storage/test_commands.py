@@ -48,6 +48,27 @@ def test_import_command_dryrun(runner):
     assert "new vuln:" in result.output
 
 
+def test_parsed_cache_commands(runner):
+    """test parsed cache warm and evict"""
+
+    result = runner.invoke(command, ["parsed-cache-evict"])
+    assert result.exit_code == 0
+
+    result = runner.invoke(command, ["parsed-cache-warm", "nessus", "tests/server/data/parser-nessus-simple.xml", "notexist"])
+    assert result.exit_code == 0
+
+    result = runner.invoke(command, ["import", "--dry", "--cache", "nessus", "tests/server/data/parser-nessus-simple.xml"])
+    assert result.exit_code == 0
+    assert "new vuln:" in result.output
+
+    result = runner.invoke(command, ["parsed-cache-warm", "invalid"])
+    assert result.exit_code == 1
+
+    result = runner.invoke(command, ["parsed-cache-evict", "--max-size", "0"])
+    assert result.exit_code == 0
+    assert "1 entries evicted" in result.output
+
+
 def test_flush_command(runner, service, vuln, note):  # pylint: disable=unused-argument
     """flush storage database"""
 
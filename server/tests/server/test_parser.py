@@ -3,7 +3,9 @@
 test parser api
 """
 
-from sner.server.parser import ParsedItemsDb
+from unittest.mock import patch
+
+from sner.server.parser import REGISTERED_PARSERS, ParsedCache, ParsedItemsDb, parser_version
 
 
 def test_pidb_str():
@@ -63,3 +65,56 @@ def test_upsert_note():
     assert len(pidb.hosts) == 2
     assert len(pidb.services) == 1
     assert len(pidb.notes) == 2
+
+
+def test_upsert_removed_item():
+    """test upsert of item removed from table directly"""
+
+    pidb = ParsedItemsDb()
+    service = pidb.upsert_service(host_address="192.0.2.1", proto="tcp", port=21)
+    pidb.services.remove(service)
+    new_service = pidb.upsert_service(host_address="192.0.2.1", proto="tcp", port=21, name="ftp")
+
+    assert len(pidb.hosts) == 1
+    assert list(pidb.services) == [new_service]
+    assert new_service.iid != service.iid
+
+
+def test_parsed_cache(app, tmp_path):  # pylint: disable=unused-argument
+    """test parsed items cache"""
+
+    cache = ParsedCache(tmp_path, 1024**2)
+    pidb = cache.parse("dummy", "tests/server/data/parser-dummy-job.zip")
+    assert len(cache.entries()) == 1
+
+    with patch.object(REGISTERED_PARSERS["dummy"], "parse_path", side_effect=RuntimeError):
+        cached_pidb = cache.parse("dummy", "tests/server/data/parser-dummy-job.zip")
+    assert [item.address for item in cached_pidb.hosts] == [item.address for item in pidb.hosts]
+
+    cache.parse("jarm", "tests/server/data/parser-jarm-job.zip")
+    assert len(cache.entries()) == 2
+    assert cache.evict() == 0
+    assert cache.evict(1024**2) == 0
+    assert cache.evict(0) == 2
+    assert not cache.entries()
+
+
+def test_parsed_cache_corrupted(app, tmp_path):  # pylint: disable=unused-argument
+    """test parsed items cache drops corrupted entry"""
+
+    cache = ParsedCache(tmp_path, 1024**2)
+    key = cache.key("dummy", "tests/server/data/parser-dummy-job.zip")
+    (tmp_path / f"{key}.pickle").write_bytes(b"corrupted")
+
+    assert cache.get(key) is None
+    assert not cache.entries()
+    assert cache.parse("dummy", "tests/server/data/parser-dummy-job.zip").hosts
+    assert len(cache.entries()) == 1
+
+
+def test_parser_version(app):  # pylint: disable=unused-argument
+    """test parser version includes versions of parser bases"""
+
+    expected = [str(REGISTERED_PARSERS["nmap"].VERSION), str(REGISTERED_PARSERS["manymap"].VERSION)]
+    assert parser_version(REGISTERED_PARSERS["manymap"]).split(":")[1:] == expected
+    assert all(parser_version(parser) for parser in REGISTERED_PARSERS.values())
@@ -0,0 +1,29 @@
+# This file is part of sner4 project governed by MIT license, see the LICENSE.txt file.
+"""
+sner.lib tests
+"""
+
+from pathlib import Path
+from zipfile import ZipFile
+
+from sner.lib import ZipReader, is_zip
+
+
+def test_zipreader(tmpworkdir):  # pylint: disable=unused-argument
+    """test zip reader and zip detection"""
+
+    with ZipFile("test.zip", "w") as ftmp:
+        ftmp.writestr("output-1.xml", "data1")
+        ftmp.writestr("output-2.xml", "data2")
+        ftmp.writestr("assignment.json", "{}")
+    Path("test.txt").write_text("PK", encoding="utf-8")
+
+    assert is_zip("test.zip")
+    assert not is_zip("test.txt")
+
+    with ZipReader("test.zip") as zreader:
+        assert zreader.names() == ["output-1.xml", "output-2.xml", "assignment.json"]
+        assert zreader.names(r"output\-[0-9]+\.xml") == ["output-1.xml", "output-2.xml"]
+        assert zreader.read("assignment.json") == b"{}"
+        assert list(zreader.contents(r"output\-[0-9]+\.xml")) == [b"data1", b"data2"]
+        assert [stream.read() for stream in zreader.streams(r"output\-2")] == [b"data2"]
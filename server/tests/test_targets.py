@@ -5,13 +5,14 @@ sner.targets tests
 
 from ipaddress import ip_address
 
-from sner.targets import SixenumTarget, TargetManager
+from sner.targets import HostTarget, RangeTarget, SixenumTarget, TargetManager
 
 
 def test_manager():
     """test manager"""
 
     assert isinstance(TargetManager.from_str("sixenum,::1"), SixenumTarget)
+    assert isinstance(TargetManager.from_str("range,::1-::2"), RangeTarget)
 
 
 def test_sixenumtarget_boundaries():
@@ -19,3 +20,23 @@ def test_sixenumtarget_boundaries():
 
     assert SixenumTarget("::1").boundaries() == (ip_address("::1"), ip_address("::1"))
     assert SixenumTarget("::1-fffa").boundaries() == (ip_address("::1"), ip_address("::fffa"))
+
+
+def test_rangetarget():
+    """check range target splitting and slicing"""
+
+    ranges = RangeTarget.from_network("127.0.0.128/23")
+    assert [str(item) for item in ranges] == ["range,127.0.0.0-127.0.0.255", "range,127.0.1.0-127.0.1.255"]
+    assert ranges[0].hashval() == "127.0.0.0/24"
+    assert not ranges[0].is_ipv6_address()
+    assert RangeTarget.from_network("2001:db8::1/128") == [RangeTarget("2001:db8::1", "2001:db8::1")]
+
+    hosts, remainder = ranges[1].slice(2)
+    assert hosts == [HostTarget("127.0.1.0"), HostTarget("127.0.1.1")]
+    assert remainder == RangeTarget("127.0.1.2", "127.0.1.255")
+    assert remainder.size() == 254
+    assert remainder.scope() == ("127.0.1.2/31", "127.0.1.4/30", "127.0.1.8/29", "127.0.1.16/28", "127.0.1.32/27", "127.0.1.64/26", "127.0.1.128/25")
+
+    hosts, remainder = RangeTarget("127.0.1.254", "127.0.1.255").slice(10)
+    assert len(hosts) == 2
+    assert remainder is None